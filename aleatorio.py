@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+aleatorio.py
+------------
+
+Generadores de números aleatorios que se les pasan a los algoritmos (genetico.Genetico,
+blocales.temple_simulado) y a los problemas (nreinas.ProblemaNreinas) en lugar de usar
+el módulo random global.
+
+Cada objeto Aleatorio es un flujo propio: una corrida con la misma semilla se repite
+igual aunque haya otras corridas en el mismo proceso, y de un flujo se sacan flujos
+independientes para cada trabajador o isla (ver flujos). Además de los métodos de
+random.Random, entrega números en bloque: muchos flotantes o índices de una vez en un
+arreglo de numpy (uniformes, indices, parejas), y parejas de índices distintos tomadas
+de bloques sorteados por adelantado (pareja). Ejemplo:
+
+    azar = Aleatorio(42)
+    problema = nreinas.ProblemaNreinas(64, azar=azar)
+    genetico.GeneticoPermutaciones1(0.05, azar=azar).busqueda(problema, 1, 64, 100)
+
+Por default todos usan GLOBAL, que sortea con random y numpy.random, así que
+random.seed y numpy.random.seed siguen sirviendo para repetir una corrida.
+
+"""
+
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Aleatorio(object):
+    """
+    Un flujo de números aleatorios, con un random.Random y un numpy.random.RandomState
+    propios. Se puede guardar en un punto de control (getstate y setstate) y mandar a
+    otros procesos con pickle.
+
+    """
+    def __init__(self, semilla=None, bloque=4096, generador=None, generador_numpy=None):
+        """
+        @param semilla: La semilla (None para tomarla del sistema)
+        @param bloque: Cuántas parejas se sortean a la vez en pareja (None para sortearlas
+                       una por una)
+        @param generador: Opcional, un objeto con los métodos de random.Random que se usa
+                          en lugar de uno nuevo (GLOBAL usa el módulo random)
+        @param generador_numpy: Opcional, un numpy.random.RandomState (o el módulo
+                                numpy.random) que se usa en lugar de uno nuevo
+        """
+        self.generador = generador if generador is not None else random.Random(semilla)
+        self.bloque = bloque
+        self._numpy = generador_numpy
+        self._parejas = {}
+        self._enlaza()
+
+    def _enlaza(self):
+        #Los métodos del generador se copian al objeto, así azar.random() cuesta lo mismo
+        #que random.random()
+        g = self.generador
+        self.random, self.randint, self.randrange = g.random, g.randint, g.randrange
+        self.shuffle, self.sample, self.getrandbits = g.shuffle, g.sample, g.getrandbits
+
+    @property
+    def numpy(self):
+        """
+        El generador de numpy. Se crea la primera vez que se usa, con una semilla sacada
+        del generador, así que crear un flujo que no lo usa es barato.
+        """
+        if self._numpy is None:
+            if np is None:
+                raise ImportError("Los sorteos en bloque requieren tener instalado numpy")
+            self._numpy = np.random.RandomState(self.generador.getrandbits(32))
+        return self._numpy
+
+    def uniformes(self, m):
+        """
+        @return: Un arreglo de numpy con m números uniformes en [0, 1)
+        """
+        return self.numpy.random_sample(m)
+
+    def indices(self, n, m):
+        """
+        @return: Un arreglo de numpy con m enteros uniformes en range(n)
+        """
+        return self.numpy.randint(0, n, m)
+
+    def parejas(self, n, m):
+        """
+        @return: Dos arreglos de numpy i, j con m parejas de índices de range(n), con
+                 i[k] != j[k]
+        """
+        i = self.numpy.randint(0, n, m)
+        j = self.numpy.randint(0, n - 1, m)
+        j += j >= i
+        return i, j
+
+    def pareja(self, n):
+        """
+        Una pareja de índices distintos de range(n), en O(1) (random.sample(range(n), 2)
+        es O(n)). Si hay bloque, las parejas de cada n se sortean por adelantado de bloque
+        en bloque con numpy.
+
+        @return: Una tupla (i, j) con i != j
+        """
+        reserva = self._parejas.get(n)
+        if reserva:
+            return reserva.pop()
+        if self.bloque is None or np is None:
+            i = int(self.random() * n)
+            j = int(self.random() * (n - 1))
+            return i, j + (j >= i)
+        i, j = self.parejas(n, self.bloque)
+        reserva = self._parejas[n] = zip(i.tolist(), j.tolist())
+        return reserva.pop()
+
+    def flujos(self, k, bloque=4096):
+        """
+        Flujos independientes, por ejemplo uno por trabajador o por isla. Sus semillas se
+        sacan de este flujo, así que con la misma semilla se obtienen los mismos flujos.
+
+        @param k: Número de flujos
+        @param bloque: El bloque de los nuevos flujos
+
+        @return: Una lista de k objetos Aleatorio
+
+        """
+        return [Aleatorio(self.getrandbits(64), bloque) for _ in xrange(k)]
+
+    def getstate(self):
+        """
+        @return: El estado del flujo, para restaurarlo con setstate
+        """
+        return (self.generador.getstate(),
+                self._numpy.get_state() if self._numpy is not None else None,
+                dict((n, list(reserva)) for n, reserva in self._parejas.items()))
+
+    def setstate(self, estado):
+        python, numpy, parejas = estado
+        self.generador.setstate(python)
+        if numpy is None:
+            self._numpy = None
+        else:
+            if self._numpy is None:
+                self._numpy = np.random.RandomState()
+            self._numpy.set_state(numpy)
+        self._parejas = dict((n, list(reserva)) for n, reserva in parejas.items())
+
+    def __reduce__(self):
+        #GLOBAL se manda por nombre, así en otro proceso es el GLOBAL de ese proceso
+        if self is GLOBAL:
+            return 'GLOBAL'
+        return _restaura, (self.bloque, self.getstate())
+
+
+def _restaura(bloque, estado):
+    azar = Aleatorio(0, bloque)
+    azar.setstate(estado)
+    return azar
+
+
+GLOBAL = Aleatorio(bloque=None, generador=random, generador_numpy=np.random if np is not None else None)
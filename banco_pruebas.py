@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+banco_pruebas.py
+------------
+
+Banco de pruebas reproducible para las búsquedas locales de blocales.py y los
+algoritmos genéticos de genetico.py con el problema de las n reinas.
+
+Cada configuración (algoritmo, n y parámetros) se corre varias veces con semillas fijas,
+cada corrida en un proceso nuevo para poder medir su pico de memoria. Todas las
+corridas se detienen al encontrar una solución (costo 0), así que el tiempo de cada
+corrida exitosa es el tiempo a la solución.
+
+Se reporta la tasa de éxito, percentiles del tiempo a la solución, evaluaciones de
+costo por segundo y pico de memoria, y se guarda en JSON y CSV para comparar contra
+corridas anteriores. Ejemplo:
+
+    python banco_pruebas.py --n 8 16 32 --repeticiones 10 --salida resultados
+
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import resource
+import time
+from itertools import product
+
+import blocales
+import genetico
+import nreinas
+import servicio
+
+ALGORITMOS = ('genetico1', 'genetico2', 'temple', 'colinas')
+
+PARAMETROS = {'genetico1': {'n_poblacion': [32], 'n_generaciones': [100], 'prob_muta': [0.05]},
+              'genetico2': {'n_poblacion': [32], 'n_generaciones': [100], 'prob_muta': [0.5]},
+              'temple': {'K': [100], 'delta': [0.01]},
+              'colinas': {'reinicios': [10]}}
+
+
+def configuraciones(algoritmos=ALGORITMOS, valores_n=(8, 16, 32, 64, 128), parametros=None):
+    """
+    Genera todas las combinaciones de algoritmo, n y parámetros a probar
+
+    @param algoritmos: Los algoritmos a probar (ver ALGORITMOS)
+    @param valores_n: Los números de reinas
+    @param parametros: Un diccionario por algoritmo, de nombre de parámetro a lista de
+                       valores, que reemplaza a los de PARAMETROS
+
+    @return: Una lista de diccionarios con las llaves 'algoritmo', 'n' y 'parametros'
+
+    """
+    parametros = parametros or {}
+    lista = []
+    for algoritmo in algoritmos:
+        rejilla = dict(PARAMETROS[algoritmo], **parametros.get(algoritmo, {}))
+        nombres = sorted(rejilla)
+        for n in valores_n:
+            for valores in product(*[rejilla[nombre] for nombre in nombres]):
+                lista.append({'algoritmo': algoritmo, 'n': n, 'parametros': dict(zip(nombres, valores))})
+    return lista
+
+
+def corrida(argumentos):
+    """
+    Hace una corrida de una configuración con una semilla. Pensada para ejecutarse en un
+    proceso nuevo (ver banco), ya que el pico de memoria que reporta es el del proceso.
+
+    @param argumentos: Una tupla (configuracion, semilla)
+
+    @return: Un diccionario con el costo, si hubo éxito, el tiempo, las evaluaciones y el
+             pico de memoria en KB
+
+    """
+    configuracion, semilla = argumentos
+    random.seed(semilla)
+    if genetico.np is not None:
+        genetico.np.random.seed(semilla % 2 ** 32)
+    problema = nreinas.ProblemaNreinas(configuracion['n'])
+    informe = {}
+
+    inicio = time.time()
+    servicio.ejecuta(configuracion['algoritmo'], problema, configuracion['parametros'],
+                     [blocales.CostoObjetivo(0)], informe)
+    tiempo = time.time() - inicio
+
+    return {'semilla': semilla,
+            'costo': informe['costo'],
+            'exito': informe['costo'] == 0,
+            'tiempo': tiempo,
+            'evaluaciones': informe['evaluaciones'],
+            'memoria_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def percentil(valores, p):
+    """
+    Percentil p (entre 0 y 100) por rango más cercano, None si no hay valores
+
+    """
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, max(0, int(round(p / 100.0 * len(valores))) - 1))]
+
+
+def resume(configuracion, corridas):
+    """
+    Resume las corridas de una configuración en un renglón de resultados
+
+    """
+    tiempos = [c['tiempo'] for c in corridas if c['exito']]
+    tiempo_total = sum(c['tiempo'] for c in corridas)
+    renglon = {'algoritmo': configuracion['algoritmo'],
+               'n': configuracion['n'],
+               'parametros': json.dumps(configuracion['parametros'], sort_keys=True),
+               'repeticiones': len(corridas),
+               'tasa_exito': sum(c['exito'] for c in corridas) / float(len(corridas)),
+               'costo_promedio': sum(c['costo'] for c in corridas) / float(len(corridas)),
+               'evaluaciones_por_segundo': (sum(c['evaluaciones'] for c in corridas) / tiempo_total
+                                            if tiempo_total > 0 else None),
+               'memoria_pico_kb': max(c['memoria_kb'] for c in corridas)}
+    for p in (50, 90, 99):
+        renglon['tiempo_p%d' % p] = percentil(tiempos, p)
+    return renglon
+
+
+def banco(configs, repeticiones=10, semilla=0, procesos=None):
+    """
+    Corre todas las configuraciones con repeticiones. Las semillas de cada corrida salen
+    de un generador con la semilla dada, así que dos bancos con la misma semilla y las
+    mismas configuraciones hacen exactamente las mismas corridas.
+
+    @param configs: Lista generada por configuraciones
+    @param repeticiones: Corridas por configuración
+    @param semilla: Semilla del banco
+    @param procesos: Número de corridas simultáneas (1 por default, para que los
+                     tiempos no se estorben entre sí)
+
+    @return: Una tupla (resumen, detalle) con un renglón por configuración y un renglón
+             por corrida
+
+    """
+    semillas = random.Random(semilla)
+    tareas = [(config, semillas.getrandbits(32)) for config in configs for _ in range(repeticiones)]
+    grupo = multiprocessing.Pool(procesos or 1, maxtasksperchild=1)
+    try:
+        corridas = grupo.map(corrida, tareas, chunksize=1)
+    finally:
+        grupo.close()
+        grupo.join()
+
+    resumen, detalle = [], []
+    for k, config in enumerate(configs):
+        propias = corridas[k * repeticiones:(k + 1) * repeticiones]
+        resumen.append(resume(config, propias))
+        for c in propias:
+            detalle.append(dict(c, algoritmo=config['algoritmo'], n=config['n'],
+                                parametros=json.dumps(config['parametros'], sort_keys=True)))
+    return resumen, detalle
+
+
+def guarda(resumen, detalle, prefijo):
+    """
+    Guarda los resultados en prefijo.json (resumen y detalle) y prefijo.csv (resumen)
+
+    """
+    with open(prefijo + '.json', 'w') as archivo:
+        json.dump({'resumen': resumen, 'corridas': detalle}, archivo, indent=1, sort_keys=True)
+    columnas = sorted(resumen[0]) if resumen else []
+    with open(prefijo + '.csv', 'wb') as archivo:
+        escritor = csv.DictWriter(archivo, columnas)
+        escritor.writeheader()
+        escritor.writerows(resumen)
+
+
+def imprime(resumen):
+    """ Imprime una tabla con el resumen """
+
+    print "algoritmo".ljust(10) + "n".rjust(5) + "exito".rjust(7) + "t_p50".rjust(9) + \
+        "t_p90".rjust(9) + "eval/s".rjust(11) + "mem_kb".rjust(9) + "  parametros"
+    for r in resumen:
+        print r['algoritmo'].ljust(10) + str(r['n']).rjust(5) + ("%.2f" % r['tasa_exito']).rjust(7) + \
+            _formato(r['tiempo_p50']).rjust(9) + _formato(r['tiempo_p90']).rjust(9) + \
+            _formato(r['evaluaciones_por_segundo'], "%.0f").rjust(11) + \
+            str(r['memoria_pico_kb']).rjust(9) + "  " + r['parametros']
+
+
+def _formato(valor, formato="%.3f"):
+    return '-' if valor is None else formato % valor
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Banco de pruebas de búsquedas para las n reinas")
+    parser.add_argument('--algoritmos', nargs='+', default=list(ALGORITMOS), choices=ALGORITMOS)
+    parser.add_argument('--n', nargs='+', type=int, default=[8, 16, 32, 64, 128])
+    parser.add_argument('--poblacion', nargs='+', type=int, help="Tamaños de población (genéticos)")
+    parser.add_argument('--generaciones', nargs='+', type=int, help="Generaciones (genéticos)")
+    parser.add_argument('--prob-muta', nargs='+', type=float, help="Probabilidades de mutación (genéticos)")
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--procesos', type=int, default=1)
+    parser.add_argument('--salida', default=None, help="Prefijo de los archivos .json y .csv")
+    args = parser.parse_args()
+
+    rejilla = {}
+    for nombre, valores in (('n_poblacion', args.poblacion), ('n_generaciones', args.generaciones),
+                            ('prob_muta', args.prob_muta)):
+        if valores:
+            for algoritmo in ('genetico1', 'genetico2'):
+                rejilla.setdefault(algoritmo, {})[nombre] = valores
+
+    resumen, detalle = banco(configuraciones(args.algoritmos, args.n, rejilla),
+                             args.repeticiones, args.semilla, args.procesos)
+    imprime(resumen)
+    if args.salida:
+        guarda(resumen, detalle, args.salida)
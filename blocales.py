@@ -11,8 +11,21 @@ Algoritmos generales para búsquedas locales
 __author__ = 'juliowaissman'
 
 
-from math import exp
-from random import random
+from collections import namedtuple
+from itertools import islice, izip
+from math import exp, log
+from random import Random
+from time import time
+import cPickle as pickle
+import multiprocessing
+
+import aleatorio
+import puntos_control
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class Problema(object):
@@ -26,7 +39,27 @@ class Problema(object):
 
     c) temple_simulado requiere vecino_aleatorio
 
+    d) De manera opcional, si el problema implementa movimientos, movimiento_aleatorio,
+       aplica_movimiento y delta_costo, tanto descenso_colinas como temple_simulado
+       evalúan únicamente el cambio de costo de cada movimiento en lugar de recalcular
+       el costo completo de cada vecino.
+
+    e) temple_simulado_lote requiere lote_estados (y numpy). Si el problema puede
+       calcular el costo de muchos estados a la vez más rápido que uno por uno, conviene
+       sobreescribir costo_lote, que usan los algoritmos que evalúan lotes de estados.
+
+    f) minimos_conflictos requiere tablero_conflictos, y usa estado_constructivo si el
+       problema tiene una forma de construir un buen estado inicial
+
+    g) busqueda_tabu requiere tabla_movimientos (y numpy)
+
+    Los sorteos del problema y de los algoritmos que lo usan se hacen con azar, un
+    objeto aleatorio.Aleatorio (por default aleatorio.GLOBAL), así que para repetir una
+    corrida basta con darle al problema un flujo con semilla.
+
     """
+    azar = aleatorio.GLOBAL
+
     def estado_aleatorio(self):
         """
         @return Una tupla que describe un estado
@@ -67,63 +100,893 @@ class Problema(object):
         """
         raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
+    def costo_lote(self, estados):
+        """
+        Calcula el costo de muchos estados. Por default llama a costo con cada uno.
+
+        @param estados: Una lista de tuplas que describen estados
+
+        @return: Una lista con el costo de cada estado
+
+        """
+        return [self.costo(estado) for estado in estados]
+
+    def movimientos(self, estado):
+        """
+        Generador de los movimientos posibles a partir de un estado. Un movimiento es
+        cualquier objeto que el problema sepa aplicar con aplica_movimiento.
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un generador de movimientos (utilizar yield en lugar de return)
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def movimiento_aleatorio(self, estado):
+        """
+        Genera un movimiento aleatorio a partir de un estado.
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un movimiento que puede aplicarse con aplica_movimiento
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def aplica_movimiento(self, estado, movimiento):
+        """
+        Aplica un movimiento a un estado.
+
+        @param estado: Una tupla que describe un estado
+        @param movimiento: Un movimiento generado por movimientos o movimiento_aleatorio
+
+        @return: Una tupla con el estado vecino resultante
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def delta_costo(self, estado, movimiento):
+        """
+        Calcula el cambio de costo al aplicar un movimiento sin construir el estado vecino,
+        esto es costo(aplica_movimiento(estado, movimiento)) - costo(estado).
+
+        @param estado: Una tupla que describe un estado
+        @param movimiento: Un movimiento generado por movimientos o movimiento_aleatorio
+
+        @return: Un valor numérico, negativo si el movimiento mejora el estado.
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def lote_estados(self, estados):
+        """
+        Representa muchos estados a la vez para avanzarlos con operaciones de arreglos de
+        numpy. El objeto que se devuelve debe tener:
+
+        estados: Un arreglo de numpy con un estado por renglón
+        costos: Un arreglo de numpy con el costo de cada estado
+        movimientos_aleatorios(): Devuelve un movimiento aleatorio por estado, como una
+                                  tupla de arreglos
+        delta(*movimiento): Devuelve el arreglo de cambios de costo de los movimientos
+        intercambia(*movimiento, mascara, delta): Aplica los movimientos sólo a los
+                                                  estados donde mascara es verdadero
+
+        @param estados: Una lista de tuplas que describen estados
+
+        @return: Un objeto con la interfaz descrita
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def estado_constructivo(self):
+        """
+        Construye un estado inicial bueno en forma voraz (con algo de azar). Por default
+        es un estado aleatorio.
+
+        @return: Una tupla que describe un estado
+
+        """
+        return self.estado_aleatorio()
+
+    def tablero_conflictos(self, estado):
+        """
+        Representa un estado con contadores de conflictos para la búsqueda de mínimos
+        conflictos. El objeto que se devuelve debe tener:
+
+        estado: Una lista con el estado actual
+        costo: El costo del estado actual
+        conflictiva(): Devuelve en O(1) una variable (posición del estado) en conflicto
+                       elegida al azar, o None si no hay conflictos
+        candidatos(i, k): Devuelve k movimientos aleatorios que cambian la variable i
+        delta(*movimiento): El cambio de costo de un movimiento
+        intercambia(*movimiento): Aplica un movimiento
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un objeto con la interfaz descrita
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
 
-def descenso_colinas(problema, maxit=1000000):
+    def tabla_movimientos(self, estado):
+        """
+        Representa un estado junto con el cambio de costo de todos sus movimientos, para
+        la búsqueda tabú. Los movimientos se numeran de 0 a m - 1 y la numeración no
+        cambia al aplicarlos. El objeto que se devuelve debe tener:
+
+        costo: El costo del estado actual
+        deltas: Un arreglo de numpy con el cambio de costo de cada movimiento
+        aplica(k): Aplica el movimiento k, actualiza costo y deltas, y devuelve el
+                   número de deltas que tuvo que recalcular
+        actual(): Devuelve el estado actual como tupla
+
+        @param estado: Una tupla que describe un estado
+
+        @return: Un objeto con la interfaz descrita
+
+        """
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+
+def _implementa(problema, metodo):
+    """
+    Revisa si la clase del problema sobreescribe un método de Problema
+
+    """
+    return getattr(type(problema), metodo).__func__ is not getattr(Problema, metodo).__func__
+
+
+def descenso_colinas(problema, maxit=1000000, criterios=None, informe=None, modo='mejor', reinicios=0,
+                     instrumentos=None):
     """
     Busqueda local por descenso de colinas.
 
+    Si el problema implementa delta_costo, cada paso recorre los movimientos evaluando
+    sólo el cambio de costo, y el único estado que se construye es el del movimiento
+    aceptado.
+
     @param problema: Un objeto de una clase heredada de blocales.Problema
-    @param maxit: Máximo número de iteraciones
+    @param maxit: Máximo número de iteraciones de cada descenso
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio)
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe). El criterio es 'optimo_local', 'maxit' o el
+                    nombre del criterio de paro que se cumplió. También se reporta el
+                    número de descensos hechos en 'descensos'
+    @param modo: 'mejor' para tomar en cada paso el mejor vecino (descenso más pronunciado)
+                 o 'primera' para tomar el primer vecino que mejora el costo
+    @param reinicios: Número de veces que se vuelve a descender desde un estado aleatorio
+                      al llegar a un óptimo local
+    @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional; se mide el
+                         tiempo de la fase 'vecindad' y se registra cada paso
 
     @return: El estado con el menor costo encontrado
 
     """
-    estado = problema.estado_aleatorio()
-    costo = problema.costo(estado)
+    if modo not in ('mejor', 'primera'):
+        raise ValueError("Modo desconocido: " + str(modo))
+    primera = modo == 'primera'
+    criterios = inicia_criterios(criterios)
+    paso = _paso_delta if _implementa(problema, 'delta_costo') else _paso_vecinos
+    medir = instrumentos is not None
+    if medir:
+        instrumentos.inicia()
+
+    e_mejor, c_mejor = None, None
+    evaluaciones = iteraciones = descensos = 0
+    for _ in xrange(reinicios + 1):
+        estado = problema.estado_aleatorio()
+        costo = problema.costo(estado)
+        evaluaciones += 1
+        descensos += 1
 
-    for _ in xrange(maxit):
-        e = min(problema.vecinos(estado), key=problema.costo)
-        c = problema.costo(e)
-        if c >= costo:
+        criterio = 'maxit'
+        for _ in xrange(maxit):
+            fin = (revisa_criterios(criterios, iteraciones,
+                                    costo if c_mejor is None else min(costo, c_mejor), evaluaciones)
+                   if criterios else None)
+            if fin is not None:
+                criterio = fin
+                break
+            if medir:
+                t = time()
+            estado_nuevo, costo_nuevo, evaluadas = paso(problema, estado, costo, primera)
+            evaluaciones += evaluadas
+            if medir:
+                instrumentos.acumula('vecindad', t)
+            if estado_nuevo is None:
+                criterio = 'optimo_local'
+                break
+            estado, costo = estado_nuevo, costo_nuevo
+            iteraciones += 1
+            if medir and iteraciones % instrumentos.cada == 0:
+                instrumentos.registra(iteraciones, evaluaciones, costo=costo, descenso=descensos)
+
+        if c_mejor is None or costo < c_mejor:
+            e_mejor, c_mejor = estado, costo
+        if criterio not in ('optimo_local', 'maxit'):
             break
-        estado, costo = e, c
-    return estado
 
+    llena_informe(informe, criterio, iteraciones, evaluaciones, c_mejor)
+    if informe is not None:
+        informe['descensos'] = descensos
+    return e_mejor
+
+
+def minimos_conflictos(problema, maxit=1000000, muestras=32, construye=True, criterios=None, informe=None):
+    """
+    Búsqueda local de mínimos conflictos. En cada paso se elige al azar una variable en
+    conflicto y, de muestras movimientos aleatorios que la cambian, se aplica el que deja
+    menos conflictos siempre que no empeore el costo. Con un estado inicial construido
+    en forma voraz quedan pocas variables en conflicto, así que el número de pasos crece
+    muy lentamente con el tamaño del problema y cada paso cuesta O(muestras).
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema que implemente
+                     tablero_conflictos
+    @param maxit: Máximo número de pasos
+    @param muestras: Movimientos que se prueban en cada paso (al menos 1)
+    @param construye: Si se empieza con estado_constructivo en lugar de estado_aleatorio
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio)
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe). El criterio es 'solucion' si ya no quedan
+                    conflictos, 'maxit' o el nombre del criterio de paro que se cumplió
+
+    @return: El estado final
+
+    """
+    if muestras < 1:
+        raise ValueError("muestras debe ser al menos 1")
+    criterios = inicia_criterios(criterios)
+    estado = problema.estado_constructivo() if construye else problema.estado_aleatorio()
+    tablero = problema.tablero_conflictos(estado)
+    evaluaciones = 1
+
+    criterio, iteracion = 'maxit', maxit
+    for i in xrange(maxit):
+        fin = revisa_criterios(criterios, i, tablero.costo, evaluaciones) if criterios else None
+        if fin is not None:
+            criterio, iteracion = fin, i
+            break
+
+        variable = tablero.conflictiva()
+        if variable is None:
+            criterio, iteracion = 'solucion', i
+            break
+
+        mejor_delta, mejor_mov = None, None
+        for movimiento in tablero.candidatos(variable, muestras):
+            delta = tablero.delta(*movimiento)
+            if mejor_delta is None or delta < mejor_delta:
+                mejor_delta, mejor_mov = delta, movimiento
+        evaluaciones += muestras
+        if mejor_mov is not None and mejor_delta <= 0:
+            tablero.intercambia(*mejor_mov)
+
+    llena_informe(informe, criterio, iteracion, evaluaciones, tablero.costo)
+    return tuple(tablero.estado)
+
+
+def busqueda_tabu(problema, maxit=100000, tenencia=None, criterios=None, informe=None):
+    """
+    Búsqueda tabú (requiere numpy y que el problema implemente tabla_movimientos).
+
+    En cada paso se aplica el movimiento con el menor delta que no sea tabú, aunque
+    empeore el costo, así que la búsqueda no se detiene en los óptimos locales ni en las
+    mesetas. Un movimiento aplicado queda prohibido durante tenencia pasos, a menos que
+    lleve a un costo mejor que el mejor encontrado (criterio de aspiración). La
+    prohibición se guarda por número de movimiento, así que revisarla es O(1), y la
+    tabla de deltas sólo recalcula los movimientos que cambiaron.
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param maxit: Máximo número de pasos
+    @param tenencia: Pasos que un movimiento queda prohibido, por default la raíz
+                     cuadrada del número de movimientos entre 2, más 5
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio), que se
+                      revisan con el costo del mejor estado encontrado. Conviene incluir
+                      CostoObjetivo si se conoce el costo óptimo
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe). El criterio es 'maxit' o el nombre del criterio
+                    de paro que se cumplió
+
+    @return: El estado con el menor costo encontrado
 
-def temple_simulado(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01), maxit=1000000):
+    """
+    if np is None:
+        raise ImportError("busqueda_tabu requiere tener instalado numpy")
+    criterios = inicia_criterios(criterios)
+    tabla = problema.tabla_movimientos(problema.estado_aleatorio())
+    m = len(tabla.deltas)
+    if tenencia is None:
+        tenencia = int(m ** 0.5) // 2 + 5
+    prohibido_hasta = np.zeros(m, dtype=np.int64)
+    e_mejor, c_mejor = tabla.actual(), tabla.costo
+    evaluaciones = m
+    mayor = np.iinfo(np.int64).max
+
+    criterio, iteracion = 'maxit', maxit
+    for i in xrange(maxit):
+        fin = revisa_criterios(criterios, i, c_mejor, evaluaciones) if criterios else None
+        if fin is not None:
+            criterio, iteracion = fin, i
+            break
+
+        deltas = tabla.deltas
+        permitidos = (prohibido_hasta <= i) | (deltas < c_mejor - tabla.costo)
+        valores = np.where(permitidos, deltas, mayor)
+        menor = valores.min()
+        if menor == mayor:
+            continue
+        #Entre los movimientos empatados se elige uno al azar
+        opciones = np.flatnonzero(valores == menor)
+        k = opciones[int(problema.azar.random() * len(opciones))]
+
+        evaluaciones += tabla.aplica(k)
+        prohibido_hasta[k] = i + tenencia
+        if tabla.costo < c_mejor:
+            e_mejor, c_mejor = tabla.actual(), tabla.costo
+
+    llena_informe(informe, criterio, iteracion, evaluaciones, c_mejor)
+    return e_mejor
+
+
+def _paso_delta(problema, estado, costo, primera):
+    """
+    Un paso de descenso con delta_costo. Cada movimiento se evalúa una sola vez y sólo
+    se construye el estado del movimiento elegido.
+
+    @return: (estado, costo, evaluaciones), con estado None si ningún movimiento mejora
+
+    """
+    mejor_delta, mejor_mov, evaluadas = 0, None, 0
+    for movimiento in problema.movimientos(estado):
+        delta = problema.delta_costo(estado, movimiento)
+        evaluadas += 1
+        if delta < mejor_delta:
+            mejor_delta, mejor_mov = delta, movimiento
+            if primera:
+                break
+    if mejor_mov is None:
+        return None, costo, evaluadas
+    return problema.aplica_movimiento(estado, mejor_mov), costo + mejor_delta, evaluadas
+
+
+def _paso_vecinos(problema, estado, costo, primera, tam_lote=64):
+    """
+    Un paso de descenso calculando el costo completo de los vecinos con costo_lote. En
+    el modo 'mejor' se evalúan todos en un solo lote; en el modo 'primera' se evalúan
+    en lotes de tam_lote para no generar de más una vez que se encuentra una mejora.
+
+    @return: (estado, costo, evaluaciones), con estado None si ningún vecino mejora
+
+    """
+    e_mejor, c_mejor, evaluadas = None, costo, 0
+    vecinos = problema.vecinos(estado)
+    while True:
+        lote = list(islice(vecinos, tam_lote)) if primera else list(vecinos)
+        if not lote:
+            break
+        evaluadas += len(lote)
+        for vecino, c in izip(lote, problema.costo_lote(lote)):
+            if c < c_mejor:
+                e_mejor, c_mejor = vecino, c
+                if primera:
+                    return e_mejor, c_mejor, evaluadas
+        if not primera:
+            break
+    return e_mejor, c_mejor, evaluadas
+
+
+def temple_simulado(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01), maxit=1000000,
+                    criterios=None, informe=None, instrumentos=None, punto_control=None, azar=None):
     """
     Busqueda local por temple simulado
 
     @param problema: Un objeto de una clase heredada de blocales.Problema
-    @param calendarizador: Una función que recibe la iteración y devuelve la temperatura
+    @param calendarizador: Una función que recibe la iteración y devuelve la temperatura,
+                           o un objeto Calendarizador (ver Geometrico, LundyMees,
+                           Adaptativo y Recalentamiento), que además se entera de cada
+                           aceptación y del mejor costo
     @param maxit: Máximo número de iteraciones
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio), que se
+                      revisan con el costo del mejor estado encontrado
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe). El criterio es 'temperatura', 'maxit' o el
+                    nombre del criterio de paro que se cumplió
+    @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional; cada
+                         instrumentos.cada iteraciones se registra el mejor costo, el
+                         costo actual y la temperatura
+    @param punto_control: Un objeto puntos_control.PuntoControl opcional. Si su archivo
+                          existe la búsqueda se reanuda desde ahí, y mientras avanza se
+                          guarda un punto de control cada punto_control.segundos
+    @param azar: Un objeto aleatorio.Aleatorio opcional para decidir la aceptación, por
+                 default el del problema (problema.azar, que sortea los vecinos)
 
     @return: El estado con el menor costo encontrado
 
     """
+    for progreso in temple_simulado_iter(problema, calendarizador, maxit, criterios, informe,
+                                         instrumentos, punto_control, None, azar):
+        pass
+    return progreso.estado
 
-    estado = problema.estado_aleatorio()
-    costo = problema.costo(estado)
-    
-    e_mejor, c_mejor = estado, costo
 
-    for i in xrange(maxit):
+def temple_simulado_iter(problema, calendarizador=lambda i: cal_expon(i, 100, 0.01), maxit=1000000,
+                         criterios=None, informe=None, instrumentos=None, punto_control=None, cada=1000,
+                         azar=None):
+    """
+    Versión generadora de temple_simulado: entrega el progreso cada cierto número de
+    iteraciones, así que quien la usa puede detenerla cuando quiera o mostrar el avance.
+    El informe se llena y el punto de control se borra sólo si el generador se agota.
+
+    @param cada: Cada cuántas iteraciones se entrega el progreso (None para entregar
+                 sólo el final)
+    Los demás parámetros son los de temple_simulado.
+
+    @return: Un generador de objetos Progreso con la iteración, el mejor estado y su
+             costo, y las evaluaciones hechas. El último es el de la búsqueda terminada
+
+    """
+    if instrumentos is not None:
+        instrumentos.inicia()
+        cada_registro = instrumentos.cada
+    criterios = inicia_criterios(criterios)
+    adaptable = isinstance(calendarizador, Calendarizador)
+    if adaptable:
+        calendarizador.inicia(problema)
+    random = (azar or problema.azar).random
+
+    if punto_control is not None:
+        punto_control.registra_generador('azar', azar or problema.azar)
+        punto_control.registra_generador('azar_problema', problema.azar)
+    datos = punto_control.carga() if punto_control is not None else None
+    if datos is None:
+        estado = problema.estado_aleatorio()
+        costo = problema.costo(estado)
+        evaluaciones, inicio = 1, 0
+        e_mejor, c_mejor = estado, costo
+    else:
+        estado, costo, e_mejor, c_mejor = datos['estado'], datos['costo'], datos['e_mejor'], datos['c_mejor']
+        evaluaciones, inicio = datos['evaluaciones'], datos['iteracion']
+        puntos_control.restaura_criterios(criterios, datos['criterios'])
+        if adaptable:
+            calendarizador.__dict__.update(datos['calendarizador'].__dict__)
+    usa_delta = _implementa(problema, 'delta_costo')
+
+    criterio, iteracion = 'maxit', maxit
+    proximo = inicio if cada else None
+    for i in xrange(inicio, maxit):
+        if i == proximo:
+            yield Progreso(i, e_mejor, c_mejor, evaluaciones)
+            proximo += cada
+        #El reloj sólo se consulta cada 1024 iteraciones
+        if punto_control is not None and i & 1023 == 0 and punto_control.toca():
+            punto_control.guarda(iteracion=i, estado=estado, costo=costo, e_mejor=e_mejor, c_mejor=c_mejor,
+                                 evaluaciones=evaluaciones, criterios=criterios,
+                                 calendarizador=calendarizador if adaptable else None)
+        fin = revisa_criterios(criterios, i, c_mejor, evaluaciones) if criterios else None
+        if fin is not None:
+            criterio, iteracion = fin, i
+            break
+
         temperatura = calendarizador(i)
         if temperatura < 1e-8:
+            criterio, iteracion = 'temperatura', i
             break
 
-        vecino = problema.vecino_aleatorio(estado)
-        costo_vecino = problema.costo(vecino)
-        error = costo - costo_vecino
+        if instrumentos is not None and i % cada_registro == 0:
+            instrumentos.registra(i, evaluaciones, mejor=c_mejor, costo=costo, temperatura=temperatura)
+
+        if usa_delta:
+            movimiento = problema.movimiento_aleatorio(estado)
+            error = -problema.delta_costo(estado, movimiento)
+        else:
+            vecino = problema.vecino_aleatorio(estado)
+            error = costo - problema.costo(vecino)
+        evaluaciones += 1
 
-        if error > 0 or random() < exp(error / temperatura):
-            estado, costo = vecino, costo_vecino
+        aceptado = error > 0 or random() < exp(error / temperatura)
+        if aceptado:
+            if usa_delta:
+                vecino = problema.aplica_movimiento(estado, movimiento)
+            estado, costo = vecino, costo - error
         
             if c_mejor - costo > 0:
                 e_mejor, c_mejor = estado, costo
+        if adaptable:
+            calendarizador.informa(aceptado, c_mejor)
+
+    llena_informe(informe, criterio, iteracion, evaluaciones, c_mejor)
+    if punto_control is not None:
+        punto_control.termina()
+    yield Progreso(iteracion, e_mejor, c_mejor, evaluaciones)
+
+
+def temple_simulado_lote(problema, n_cadenas=32, calendarizador=lambda i: cal_expon(i, 100, 0.01),
+                         maxit=1000000, criterios=None, informe=None, instrumentos=None):
+    """
+    Temple simulado con muchas cadenas independientes a la vez (requiere numpy y que el
+    problema implemente lote_estados).
+
+    Todas las cadenas siguen el mismo calendarizador. En cada iteración se propone un
+    movimiento por cadena y se decide su aceptación para todas las cadenas con
+    operaciones de arreglos, así que una iteración cuesta casi lo mismo con una cadena
+    que con cientos.
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param n_cadenas: Número de cadenas
+    @param calendarizador: Una función que recibe la iteración y devuelve la temperatura
+    @param maxit: Máximo número de iteraciones
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio), que se
+                      revisan con el mejor costo de todas las cadenas
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe)
+    @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional; cada
+                         instrumentos.cada iteraciones se registran los costos actuales de
+                         las cadenas, su diversidad y la temperatura
+
+    @return: Una tupla (estado, estadisticas) con el mejor estado de todas las cadenas y
+             una lista con un diccionario de estadísticas por cadena
+
+    """
+    if np is None:
+        raise ImportError("temple_simulado_lote requiere tener instalado numpy")
+    if instrumentos is not None:
+        instrumentos.inicia()
+        cada = instrumentos.cada
+    lote = problema.lote_estados([problema.estado_aleatorio() for _ in range(n_cadenas)])
+    criterios = inicia_criterios(criterios)
+
+    e_mejores, c_mejores = lote.estados.copy(), lote.costos.copy()
+    it_mejores = np.zeros(n_cadenas, dtype=np.int64)
+    aceptados = np.zeros(n_cadenas, dtype=np.int64)
+
+    criterio, iteracion = 'maxit', maxit
+    for i in xrange(maxit):
+        fin = revisa_criterios(criterios, i, c_mejores.min(), n_cadenas * (i + 1)) if criterios else None
+        if fin is not None:
+            criterio, iteracion = fin, i
+            break
+
+        temperatura = calendarizador(i)
+        if temperatura < 1e-8:
+            criterio, iteracion = 'temperatura', i
+            break
+
+        if instrumentos is not None and i % cada == 0:
+            instrumentos.registra(i, n_cadenas * (i + 1), lote.costos.tolist(), lote.estados,
+                                  mejor_global=int(c_mejores.min()), temperatura=temperatura)
+
+        movimiento = lote.movimientos_aleatorios()
+        delta = lote.delta(*movimiento)
+        acepta = problema.azar.uniformes(n_cadenas) < np.exp(-np.maximum(delta, 0) / temperatura)
+        lote.intercambia(*movimiento, mascara=acepta, delta=delta)
+        aceptados += acepta
+
+        mejora = lote.costos < c_mejores
+        if mejora.any():
+            e_mejores[mejora] = lote.estados[mejora]
+            c_mejores[mejora] = lote.costos[mejora]
+            it_mejores[mejora] = i
+
+    mejor = c_mejores.argmin()
+    llena_informe(informe, criterio, iteracion, n_cadenas * (iteracion + 1), c_mejores[mejor])
+    estadisticas = [{'cadena': k,
+                     'costo_mejor': int(c_mejores[k]),
+                     'costo_final': int(lote.costos[k]),
+                     'iteracion_mejor': int(it_mejores[k]),
+                     'tasa_aceptacion': float(aceptados[k]) / max(1, iteracion)}
+                    for k in range(n_cadenas)]
+    return tuple(e_mejores[mejor].tolist()), estadisticas
+
+
+def temple_paralelo(problema, temperaturas=None, pasos=100, maxit=1000000, procesos=None,
+                    criterios=None, informe=None, semilla=None, instrumentos=None):
+    """
+    Temple paralelo (intercambio de réplicas). Una réplica del problema por temperatura
+    hace pasos de Metropolis a temperatura fija, y después de cada ronda de pasos se
+    propone intercambiar los estados de temperaturas vecinas, aceptando con probabilidad
+    min(1, exp((1/T_k - 1/T_k+1) * (costo_k - costo_k+1))). Así los estados buenos
+    encontrados a temperatura alta bajan a las temperaturas frías sin tener que ajustar
+    un calendarizador.
+
+    Las réplicas se reparten entre procesos que viven toda la búsqueda: el problema y
+    los estados iniciales se mandan una sola vez, y en lugar de mover los estados entre
+    procesos se intercambian las temperaturas. En cada ronda cada proceso recibe las
+    temperaturas de sus réplicas y devuelve sus costos, así que la comunicación no
+    depende del tamaño del problema. Con un solo proceso (o un solo núcleo) todo se hace
+    en el proceso actual, sin comunicación.
+
+    Cada réplica sortea con un flujo propio (aleatorio.Aleatorio) cuya semilla se saca de
+    un generador con la semilla dada, del que también salen los estados iniciales y los
+    sorteos de los intercambios, así que la corrida se repite igual con la misma semilla,
+    con o sin procesos.
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema (con procesos,
+                     en sistemas sin fork debe poder serializarse con pickle)
+    @param temperaturas: Lista de temperaturas, por default escalera_geometrica(0.1, 10, 8)
+    @param pasos: Pasos de Metropolis de cada réplica entre intercambios
+    @param maxit: Máximo número de pasos de cada réplica
+    @param procesos: Número de procesos, por default uno por núcleo (y no más que
+                     réplicas). Con 1 todo se hace en el proceso actual
+    @param criterios: Una lista opcional de criterios de paro (ver Criterio), que se
+                      revisan al inicio de cada ronda con el mejor costo encontrado
+    @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                    (ver llena_informe). Incluye también 'tasa_intercambio', la fracción
+                    de intercambios aceptados entre cada par de temperaturas vecinas
+    @param semilla: Semilla para las semillas de las réplicas
+    @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional; se miden las
+                         fases 'metropolis' e 'intercambio' y se registra cada ronda
+
+    @return: El estado con el menor costo encontrado
+
+    """
+    temperaturas = sorted(temperaturas or escalera_geometrica(0.1, 10.0, 8))
+    m = len(temperaturas)
+    criterios = inicia_criterios(criterios)
+    semillas = Random(semilla)
+    medir = instrumentos is not None
+    if medir:
+        instrumentos.inicia()
+
+    #Los estados iniciales también salen de la semilla
+    azar_problema = problema.azar
+    problema.azar = aleatorio.Aleatorio(semillas.getrandbits(32))
+    try:
+        estados = [problema.estado_aleatorio() for _ in range(m)]
+    finally:
+        problema.azar = azar_problema
+    costos = problema.costo_lote(estados)
+    flujos = [semillas.getrandbits(32) for _ in xrange(m)]
+    c_mejor = min(costos)
+    k_mejor = costos.index(c_mejor)
+    e_mejor = estados[k_mejor]
+    evaluaciones = m
+    propuestos, aceptados = [0] * (m - 1), [0] * (m - 1)
+    #posicion[t] es la réplica que tiene la temperatura t
+    posicion = range(m)
+    temperatura = [None] * m
+
+    n_grupos = min(m, procesos or multiprocessing.cpu_count())
+    reparto = [range(g, m, n_grupos) for g in range(n_grupos)]
+    iniciales = [[(k, estados[k], costos[k], flujos[k]) for k in replicas] for replicas in reparto]
+    del estados
+    grupos, terminada = [], False
+    try:
+        if n_grupos == 1:
+            grupos.append(_GrupoReplicas(problema, iniciales[0], pasos))
+        else:
+            for replicas in iniciales:
+                grupos.append(_ProcesoReplicas(problema, replicas, pasos))
+        criterio, iteracion = 'maxit', maxit // pasos * pasos
+        for ronda in xrange(maxit // pasos):
+            fin = revisa_criterios(criterios, ronda * pasos, c_mejor, evaluaciones) if criterios else None
+            if fin is not None:
+                criterio, iteracion = fin, ronda * pasos
+                break
+
+            if medir:
+                t = time()
+            for k_t, T in zip(posicion, temperaturas):
+                temperatura[k_t] = T
+            for grupo, replicas in zip(grupos, reparto):
+                grupo.pide('avanza', [temperatura[k] for k in replicas])
+            c_mejores = [None] * m
+            for grupo, replicas in zip(grupos, reparto):
+                for k, (costo, c_mejor_k) in zip(replicas, grupo.recibe()):
+                    costos[k], c_mejores[k] = costo, c_mejor_k
+            #Las réplicas se revisan en orden, así con empates el mejor estado no depende
+            #del reparto entre procesos
+            for k in xrange(m):
+                if c_mejores[k] < c_mejor:
+                    c_mejor, k_mejor, e_mejor = c_mejores[k], k, None
+            evaluaciones += m * pasos
+            if medir:
+                t = instrumentos.acumula('metropolis', t)
 
+            # Se alternan los pares (0,1),(2,3)... y (1,2),(3,4)... en rondas sucesivas
+            for k in xrange(ronda % 2, m - 1, 2):
+                propuestos[k] += 1
+                r1, r2 = posicion[k], posicion[k + 1]
+                a = (1.0 / temperaturas[k] - 1.0 / temperaturas[k + 1]) * (costos[r1] - costos[r2])
+                if a >= 0 or semillas.random() < exp(a):
+                    aceptados[k] += 1
+                    posicion[k], posicion[k + 1] = r2, r1
+            if medir:
+                instrumentos.acumula('intercambio', t)
+                if (ronda + 1) % instrumentos.cada == 0:
+                    #Los estados sólo se piden para estimar la diversidad
+                    estados = None
+                    if instrumentos.muestras_diversidad:
+                        estados = [None] * m
+                        for grupo in grupos:
+                            grupo.pide('estados')
+                        for grupo, replicas in zip(grupos, reparto):
+                            for k, estado in zip(replicas, grupo.recibe()):
+                                estados[k] = estado
+                        estados = [estados[k] for k in posicion]
+                    instrumentos.registra((ronda + 1) * pasos, evaluaciones, [costos[k] for k in posicion],
+                                          estados, mejor_global=c_mejor)
+
+        if e_mejor is None:
+            grupo = grupos[k_mejor % n_grupos]
+            grupo.pide('mejor', k_mejor)
+            e_mejor = grupo.recibe()
+        terminada = True
+    finally:
+        for grupo in grupos:
+            grupo.cierra(terminada)
+
+    llena_informe(informe, criterio, iteracion, evaluaciones, c_mejor)
+    if informe is not None:
+        informe['tasa_intercambio'] = [float(a) / p if p else 0.0 for a, p in zip(aceptados, propuestos)]
     return e_mejor
-    #return estado
+
+
+class _GrupoReplicas(object):
+    """
+    Las réplicas de temple_paralelo que viven en un proceso. Cada una tiene su estado,
+    su costo, el mejor estado que ha encontrado y su flujo aleatorio. Se usa directamente
+    en el proceso principal, o desde _ProcesoReplicas con los mismos métodos pide y recibe.
+
+    """
+    def __init__(self, problema, replicas, pasos):
+        """
+        @param replicas: Una lista de tuplas (k, estado, costo, semilla), con k el número
+                         de la réplica
+        """
+        self.problema, self.pasos = problema, pasos
+        self.usa_delta = _implementa(problema, 'delta_costo')
+        self.indices = dict((k, i) for i, (k, _, _, _) in enumerate(replicas))
+        self.estados = [estado for _, estado, _, _ in replicas]
+        self.costos = [costo for _, _, costo, _ in replicas]
+        self.mejores = list(self.estados)
+        self.c_mejores = list(self.costos)
+        self.flujos = [aleatorio.Aleatorio(semilla) for _, _, _, semilla in replicas]
+
+    def atiende(self, orden, argumento=None):
+        """
+        @param orden: 'avanza' (argumento: la temperatura de cada réplica), 'estados' o
+                      'mejor' (argumento: el número de la réplica)
+        @return: Con 'avanza', por réplica una tupla (costo, mejor costo); con 'estados',
+                 los estados actuales; con 'mejor', el mejor estado de la réplica
+        """
+        if orden == 'avanza':
+            return self.avanza(argumento)
+        if orden == 'estados':
+            return self.estados
+        if orden == 'mejor':
+            return self.mejores[self.indices[argumento]]
+        raise ValueError("Orden desconocida: " + str(orden))
+
+    def pide(self, orden, argumento=None):
+        self._respuesta = self.atiende(orden, argumento)
+
+    def recibe(self):
+        return self._respuesta
+
+    def cierra(self, terminada=True):
+        pass
+
+    def avanza(self, temperaturas):
+        """
+        Avanza cada réplica self.pasos pasos de Metropolis a su temperatura
+        """
+        problema, usa_delta = self.problema, self.usa_delta
+        #El flujo de cada réplica reemplaza al del problema mientras avanza, y al final se
+        #deja el que tenía (en el proceso principal el problema es el del usuario)
+        azar_problema = problema.azar
+        try:
+            for r, temperatura in enumerate(temperaturas):
+                problema.azar = self.flujos[r]
+                random = problema.azar.random
+                estado, costo = self.estados[r], self.costos[r]
+                e_mejor, c_mejor = self.mejores[r], self.c_mejores[r]
+                for _ in xrange(self.pasos):
+                    if usa_delta:
+                        movimiento = problema.movimiento_aleatorio(estado)
+                        error = -problema.delta_costo(estado, movimiento)
+                    else:
+                        vecino = problema.vecino_aleatorio(estado)
+                        error = costo - problema.costo(vecino)
+                    if error >= 0 or random() < exp(error / temperatura):
+                        if usa_delta:
+                            vecino = problema.aplica_movimiento(estado, movimiento)
+                        estado, costo = vecino, costo - error
+                        if costo < c_mejor:
+                            e_mejor, c_mejor = estado, costo
+                self.estados[r], self.costos[r] = estado, costo
+                self.mejores[r], self.c_mejores[r] = e_mejor, c_mejor
+        finally:
+            problema.azar = azar_problema
+        return zip(self.costos, self.c_mejores)
+
+
+class _ProcesoReplicas(object):
+    """
+    Un proceso con un _GrupoReplicas, al que se le piden las órdenes por un Pipe. El
+    problema y las réplicas se le pasan una sola vez, al crearlo.
+
+    """
+    def __init__(self, problema, replicas, pasos):
+        self.conexion, extremo = multiprocessing.Pipe()
+        self.proceso = multiprocessing.Process(target=_atiende_replicas,
+                                               args=(problema, replicas, pasos, extremo))
+        self.proceso.daemon = True
+        self.proceso.start()
+        #Sin el extremo del hijo en este proceso, recv falla con EOFError si el hijo muere
+        extremo.close()
+
+    def pide(self, orden, argumento=None):
+        self.conexion.send((orden, argumento))
+
+    def recibe(self):
+        """
+        @return: La respuesta del proceso. Si la orden falló se lanza su excepción, y si el
+                 proceso terminó sin responder se lanza RuntimeError
+        """
+        try:
+            respuesta, error = self.conexion.recv()
+        except EOFError:
+            self.proceso.join(1.0)
+            raise RuntimeError("El proceso de las réplicas terminó sin responder (código de salida %s)"
+                               % self.proceso.exitcode)
+        if error is not None:
+            raise error
+        return respuesta
+
+    def cierra(self, terminada=True):
+        """
+        @param terminada: Si la búsqueda terminó bien; si no, el proceso se termina sin
+                          esperarlo
+        """
+        if terminada:
+            self.conexion.send(None)
+        elif self.proceso.is_alive():
+            self.proceso.terminate()
+        self.proceso.join()
+        self.conexion.close()
+
+
+def _atiende_replicas(problema, replicas, pasos, conexion):
+    """
+    Ciclo de un proceso de temple_paralelo: atiende las órdenes hasta recibir None.
+    Responde (respuesta, None), o (None, excepción) si la orden falló.
+    """
+    try:
+        grupo = _GrupoReplicas(problema, replicas, pasos)
+    except Exception as error:
+        grupo, error_inicial = None, error
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except EOFError:
+            return
+        if mensaje is None:
+            return
+        try:
+            if grupo is None:
+                raise error_inicial
+            conexion.send((grupo.atiende(*mensaje), None))
+        except Exception as error:
+            #La excepción viaja con pickle; si no se puede, se manda su repr
+            try:
+                pickle.loads(pickle.dumps(error, pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                error = RuntimeError("Error en las réplicas: %r" % (error,))
+            conexion.send((None, error))
+
+
+def escalera_geometrica(t_min, t_max, n):
+    """
+    Temperaturas en progresión geométrica, para temple_paralelo
+
+    @param t_min: La temperatura más fría
+    @param t_max: La temperatura más caliente
+    @param n: Número de temperaturas (al menos 2)
+
+    @return: Una lista de n temperaturas de t_min a t_max
+
+    """
+    razon = (float(t_max) / t_min) ** (1.0 / (n - 1))
+    return [t_min * razon ** k for k in range(n)]
 
 
 def cal_expon(iteracion, K=100, delta=0.01):
@@ -139,4 +1002,330 @@ def cal_expon(iteracion, K=100, delta=0.01):
     @return: Un flotante con la temperatura a esa iteración
 
     """
-    return K * exp(-delta * iteracion)
\ No newline at end of file
+    return K * exp(-delta * iteracion)
+
+
+def temperatura_inicial(problema, muestras=200, aceptacion=0.8):
+    """
+    Estima una temperatura inicial con la que se acepta más o menos la fracción dada de
+    los movimientos que empeoran el costo: con el promedio de los incrementos de costo
+    de movimientos aleatorios desde estados aleatorios, T0 = -promedio / ln(aceptacion).
+
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param muestras: Número de movimientos que se prueban
+    @param aceptacion: Probabilidad deseada de aceptar un movimiento que empeora
+
+    @return: Un flotante con la temperatura
+
+    """
+    usa_delta = _implementa(problema, 'delta_costo')
+    incrementos = []
+    estado = problema.estado_aleatorio()
+    costo = None if usa_delta else problema.costo(estado)
+    for k in xrange(muestras):
+        if k % 10 == 0 and k:
+            estado = problema.estado_aleatorio()
+            costo = None if usa_delta else problema.costo(estado)
+        if usa_delta:
+            delta = problema.delta_costo(estado, problema.movimiento_aleatorio(estado))
+        else:
+            delta = problema.costo(problema.vecino_aleatorio(estado)) - costo
+        if delta > 0:
+            incrementos.append(delta)
+    if not incrementos:
+        return 1.0
+    return -float(sum(incrementos)) / len(incrementos) / log(aceptacion)
+
+
+class Calendarizador(object):
+    """
+    Calendarizador con estado para temple_simulado. Al empezar la búsqueda se llama a
+    inicia, en cada iteración se llama una vez al objeto con la iteración para obtener
+    la temperatura, y después de decidir el movimiento se llama a informa.
+
+    Las subclases guardan la temperatura actual en self.t y la actualizan en
+    __call__, así que cada iteración cuesta una multiplicación y no una exponencial.
+    Con t0=None la temperatura inicial se estima con temperatura_inicial.
+
+    """
+    def __init__(self, t0=None, aceptacion=0.8):
+        """
+        @param t0: Temperatura inicial, o None para estimarla del problema
+        @param aceptacion: Probabilidad de aceptar un movimiento que empeora que se busca
+                           al estimar la temperatura inicial
+        """
+        self.t0 = t0
+        self.aceptacion = aceptacion
+        self.t = t0
+
+    def inicia(self, problema):
+        self.t = self.t0 if self.t0 is not None else temperatura_inicial(problema, aceptacion=self.aceptacion)
+        self.inicial = self.t
+
+    def __call__(self, iteracion):
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+    def informa(self, aceptado, mejor):
+        """
+        @param aceptado: Si se aceptó el movimiento de esta iteración
+        @param mejor: El mejor costo encontrado hasta ahora
+        """
+        pass
+
+
+class Geometrico(Calendarizador):
+    """
+    Enfriamiento geométrico: en cada iteración la temperatura se multiplica por alfa
+
+    """
+    def __init__(self, t0=None, alfa=0.999, aceptacion=0.8):
+        Calendarizador.__init__(self, t0, aceptacion)
+        self.alfa = alfa
+
+    def __call__(self, iteracion):
+        t = self.t
+        self.t *= self.alfa
+        return t
+
+
+class LundyMees(Calendarizador):
+    """
+    Calendarizador de Lundy y Mees: t <- t / (1 + beta * t), que enfría rápido a
+    temperatura alta y muy despacio a temperatura baja
+
+    """
+    def __init__(self, t0=None, beta=1e-3, aceptacion=0.8):
+        Calendarizador.__init__(self, t0, aceptacion)
+        self.beta = beta
+
+    def __call__(self, iteracion):
+        t = self.t
+        self.t = t / (1.0 + self.beta * t)
+        return t
+
+
+class Adaptativo(Calendarizador):
+    """
+    Ajusta la temperatura según la tasa de aceptación: cada ventana iteraciones compara
+    la fracción de movimientos aceptados con una tasa objetivo, que baja en forma
+    geométrica desde tasa_inicial, y enfría si se aceptaron de más o calienta si se
+    aceptaron de menos
+
+    """
+    def __init__(self, t0=None, tasa_inicial=0.5, decaimiento=0.97, ventana=100, ajuste=0.9,
+                 aceptacion=0.8):
+        """
+        @param tasa_inicial: La tasa de aceptación objetivo al principio
+        @param decaimiento: Factor por el que se multiplica la tasa objetivo en cada ventana
+        @param ventana: Cada cuántas iteraciones se ajusta la temperatura
+        @param ajuste: Factor (menor a 1) por el que se multiplica o divide la temperatura
+        """
+        Calendarizador.__init__(self, t0, aceptacion)
+        self.tasa_inicial = tasa_inicial
+        self.decaimiento = decaimiento
+        self.ventana = ventana
+        self.ajuste = ajuste
+
+    def inicia(self, problema):
+        Calendarizador.inicia(self, problema)
+        self.objetivo = self.tasa_inicial
+        self.aceptados = self.pasos = 0
+
+    def __call__(self, iteracion):
+        return self.t
+
+    def informa(self, aceptado, mejor):
+        self.aceptados += aceptado
+        self.pasos += 1
+        if self.pasos == self.ventana:
+            if self.aceptados > self.objetivo * self.ventana:
+                self.t *= self.ajuste
+            else:
+                self.t /= self.ajuste
+            self.objetivo *= self.decaimiento
+            self.aceptados = self.pasos = 0
+
+
+class Recalentamiento(Calendarizador):
+    """
+    Agrega recalentamiento a otro calendarizador: si el mejor costo no mejora en
+    paciencia iteraciones, la temperatura vuelve a una fracción de la inicial, hasta
+    un número máximo de veces
+
+    """
+    def __init__(self, base, paciencia=5000, fraccion=0.5, maximo=10):
+        """
+        @param base: El Calendarizador al que se le agrega el recalentamiento
+        @param paciencia: Iteraciones sin mejora antes de recalentar
+        @param fraccion: Fracción de la temperatura inicial a la que se recalienta
+        @param maximo: Máximo número de recalentamientos
+        """
+        self.base = base
+        self.paciencia = paciencia
+        self.fraccion = fraccion
+        self.maximo = maximo
+
+    def inicia(self, problema):
+        self.base.inicia(problema)
+        self.recalentamientos = self.sin_mejora = 0
+        self.mejor = None
+
+    def __call__(self, iteracion):
+        return self.base(iteracion)
+
+    def informa(self, aceptado, mejor):
+        self.base.informa(aceptado, mejor)
+        if self.mejor is None or mejor < self.mejor:
+            self.mejor, self.sin_mejora = mejor, 0
+            return
+        self.sin_mejora += 1
+        if self.sin_mejora >= self.paciencia and self.recalentamientos < self.maximo:
+            self.base.t = max(self.base.t, self.fraccion * self.base.inicial)
+            self.recalentamientos += 1
+            self.sin_mejora = 0
+
+
+class Progreso(namedtuple('Progreso', 'iteracion estado costo evaluaciones')):
+    """
+    Avance de una búsqueda, que entregan los generadores temple_simulado_iter y
+    Genetico.busqueda_iter: la iteración (o generación), el mejor estado encontrado
+    hasta el momento, su costo y el número de evaluaciones de costo hechas.
+
+    """
+    __slots__ = ()
+
+
+class Criterio(object):
+    """
+    Criterio de paro para las búsquedas. Cada criterio tiene un nombre, que es el que se
+    reporta en el informe de la búsqueda cuando el criterio se cumple.
+
+    Se llama con la iteración (o generación), el mejor costo encontrado hasta el momento y
+    el número de evaluaciones de costo hechas, y devuelve True si hay que detenerse.
+    Es posible que guarde estado, por lo que inicia se llama al empezar cada búsqueda.
+
+    """
+    nombre = 'criterio'
+
+    def inicia(self):
+        pass
+
+    def __call__(self, iteracion, costo, evaluaciones):
+        raise NotImplementedError("¡Este metodo debe ser implementado por la subclase!")
+
+
+class CostoObjetivo(Criterio):
+    """
+    Se detiene al encontrar un estado con costo menor o igual al objetivo
+
+    """
+    nombre = 'costo_objetivo'
+
+    def __init__(self, objetivo=0):
+        self.objetivo = objetivo
+
+    def __call__(self, iteracion, costo, evaluaciones):
+        return costo <= self.objetivo
+
+
+class Estancamiento(Criterio):
+    """
+    Se detiene si el mejor costo no ha mejorado en k iteraciones
+
+    """
+    nombre = 'estancamiento'
+
+    def __init__(self, k):
+        self.k = k
+        self.inicia()
+
+    def inicia(self):
+        self.mejor, self.desde = None, 0
+
+    def __call__(self, iteracion, costo, evaluaciones):
+        if self.mejor is None or costo < self.mejor:
+            self.mejor, self.desde = costo, iteracion
+            return False
+        return iteracion - self.desde >= self.k
+
+
+class TiempoLimite(Criterio):
+    """
+    Se detiene cuando han pasado un número de segundos desde el inicio de la búsqueda
+
+    """
+    nombre = 'tiempo'
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.inicia()
+
+    def inicia(self):
+        self.limite = time() + self.segundos
+
+    def __call__(self, iteracion, costo, evaluaciones):
+        return time() >= self.limite
+
+    def __getstate__(self):
+        #En un punto de control se guarda el tiempo restante y no el instante límite
+        return {'segundos': self.segundos, 'restante': self.limite - time()}
+
+    def __setstate__(self, estado):
+        self.segundos = estado['segundos']
+        self.limite = time() + estado['restante']
+
+
+class LimiteEvaluaciones(Criterio):
+    """
+    Se detiene cuando se han hecho un número máximo de evaluaciones de costo
+
+    """
+    nombre = 'evaluaciones'
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+
+    def __call__(self, iteracion, costo, evaluaciones):
+        return evaluaciones >= self.maximo
+
+
+def inicia_criterios(criterios):
+    """
+    Inicia una lista de criterios de paro para una nueva búsqueda
+
+    @param criterios: Una lista de objetos Criterio o None
+
+    @return: La lista de criterios (vacía si criterios es None)
+
+    """
+    criterios = list(criterios or [])
+    for criterio in criterios:
+        criterio.inicia()
+    return criterios
+
+
+def revisa_criterios(criterios, iteracion, costo, evaluaciones):
+    """
+    @return: El nombre del primer criterio que se cumple, o None si ninguno se cumple
+
+    """
+    for criterio in criterios:
+        if criterio(iteracion, costo, evaluaciones):
+            return criterio.nombre
+    return None
+
+
+def llena_informe(informe, criterio, iteraciones, evaluaciones, costo):
+    """
+    Reporta cómo terminó una búsqueda en un diccionario, si se proporcionó uno
+
+    @param informe: Un diccionario o None
+    @param criterio: El nombre de la razón por la que terminó la búsqueda
+    @param iteraciones: Número de iteraciones (o generaciones) completadas
+    @param evaluaciones: Número de evaluaciones de costo (o de delta de costo)
+    @param costo: El costo del estado devuelto
+
+    """
+    if informe is not None:
+        informe.update(criterio=criterio, iteraciones=iteraciones,
+                       evaluaciones=evaluaciones, costo=costo)
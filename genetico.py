@@ -5,7 +5,7 @@ genetico.py
 ------------
 Este modulo incluye el algoritmo genérico para algoritmos genéticos, así como un
 algoritmo genético adaptado a problemas de permutaciones, como el problema de las
-n-reinas o el agente viajero.
+n-reinas o el agente viajero (ver nreinas.py y viajero.py).
 Como tarea se pide desarrollar otro algoritmo genético con el fin de probar otro tipo
 de métodos internos, así como ajustar ambos algortmos para que funcionen de la mejor
 manera posible.
@@ -15,71 +15,1031 @@ y nreinas.py vistas en clase.
 
 __author__ = 'Escribe aquí tu nombre'
 
+import aleatorio
+import blocales
+import instrumentacion
 import nreinas
+import puntos_control
 import random
 import time
+from collections import OrderedDict
+from bisect import bisect_right
+from itertools import chain
+from array import array
+from math import log
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CacheCosto(object):
+    """
+    Memoriza el costo de los individuos (tuplas) con un número máximo de entradas,
+    desalojando al individuo usado hace más tiempo cuando se llena.
+
+    Lleva la cuenta de aciertos y fallos para saber cuánto trabajo se ahorró.
+    """
+    def __init__(self, costo, maximo=10000, costo_lote=None):
+        """
+        @param costo: Una función de costo (recibe un estado y devuelve un número)
+        @param maximo: Número máximo de individuos memorizados
+        @param costo_lote: Función opcional que recibe una lista de individuos y devuelve
+                           la lista de sus costos (como Problema.costo_lote). Si se da,
+                           lote evalúa con ella a todos los individuos que no están en
+                           la cache en una sola llamada
+        """
+        self.costo = costo
+        self.costo_lote = costo_lote
+        self.maximo = maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self._tabla = OrderedDict()
+
+    def __len__(self):
+        return len(self._tabla)
+
+    def __contains__(self, individuo):
+        return individuo in self._tabla
+
+    def __call__(self, individuo):
+        try:
+            valor = self._tabla.pop(individuo)
+            self.aciertos += 1
+        except KeyError:
+            valor = self.costo(individuo)
+            self.fallos += 1
+        self._guarda(individuo, valor)
+        return valor
+
+    def _guarda(self, individuo, valor):
+        tabla = self._tabla
+        if len(tabla) >= self.maximo:
+            tabla.popitem(last=False)
+        tabla[individuo] = valor
+
+    def lote(self, poblacion, evalua=None):
+        """
+        Costo de una lista de individuos, evaluando una sola vez a los repetidos
+        @param poblacion: Una lista de individuos
+        @param evalua: Función opcional que recibe la lista de individuos que no están en
+                       la cache (sin repetidos) y devuelve la lista de sus costos, por
+                       ejemplo para repartirlos entre varios procesos
+        @return: Una lista con el costo de cada individuo
+        """
+        if evalua is None:
+            evalua = self.costo_lote
+        nuevos = {}
+        if evalua is not None:
+            faltan = []
+            for individuo in poblacion:
+                if individuo not in self._tabla and individuo not in nuevos:
+                    nuevos[individuo] = None
+                    faltan.append(individuo)
+            if faltan:
+                nuevos = dict(zip(faltan, evalua(faltan)))
+        costos = []
+        for individuo in poblacion:
+            if individuo in nuevos:
+                valor = nuevos.pop(individuo)
+                self.fallos += 1
+                self._guarda(individuo, valor)
+            else:
+                valor = self(individuo)
+            costos.append(valor)
+        return costos
+
+    def instantanea(self):
+        """
+        @return: El contenido de la cache y sus cuentas, para un punto de control
+        """
+        return self.aciertos, self.fallos, self._tabla.items()
+
+    def restaura(self, instantanea):
+        """
+        Deja la cache como estaba al tomar la instantánea
+        """
+        self.aciertos, self.fallos, elementos = instantanea
+        self._tabla = OrderedDict(elementos)
+
+
+def crea_ejecutor(tipo='procesos', n_trabajadores=None):
+    """
+    Crea un grupo de trabajadores para evaluar el costo en paralelo
+    @param tipo: 'procesos' (multiprocessing.Pool) o 'hilos' (ThreadPool, útil sólo si
+                 la función de costo libera el GIL)
+    @param n_trabajadores: Número de trabajadores, por default uno por núcleo
+    @return: Un objeto con el método map, que hay que cerrar con close() al terminar
+    """
+    if tipo == 'procesos':
+        return multiprocessing.Pool(n_trabajadores)
+    if tipo == 'hilos':
+        return ThreadPool(n_trabajadores)
+    raise ValueError("Tipo de ejecutor desconocido: " + str(tipo))
+
+
+def evalua_en_paralelo(ejecutor, problema, poblacion, tam_bloque=None, semillas=None):
+    """
+    Calcula el costo de una lista de individuos repartiéndola en bloques entre los
+    trabajadores de un ejecutor.
+
+    Si se da un generador de semillas, cada bloque sortea con una semilla propia sacada de
+    él en el proceso principal: la copia del problema que recibe el trabajador sortea con
+    un flujo nuevo (aleatorio.Aleatorio) con esa semilla, y random se inicializa con ella
+    para los costos que usan el módulo directamente. Así el resultado no depende de qué
+    trabajador atiende cada bloque y una corrida con la misma semilla se repite igual.
+    Con hilos el problema y random son los del proceso principal y no se tocan, así que
+    ahí el costo debe ser determinista.
+
+    @param ejecutor: Un objeto con el método map (ver crea_ejecutor)
+    @param problema: El problema, debe poder serializarse con pickle si son procesos
+    @param poblacion: Una lista de individuos
+    @param tam_bloque: Individuos por bloque, por default se hacen unos 4 bloques por núcleo
+    @param semillas: Un objeto random.Random del que se sacan las semillas de los bloques
+    @return: Una lista con el costo de cada individuo
+    """
+    if tam_bloque is None:
+        tam_bloque = max(1, len(poblacion) // (4 * multiprocessing.cpu_count()))
+    bloques = [(problema, poblacion[i:i + tam_bloque],
+                semillas.getrandbits(32) if semillas is not None else None)
+               for i in range(0, len(poblacion), tam_bloque)]
+    return [c for costos in ejecutor.map(_evalua_bloque, bloques) for c in costos]
+
+
+def _evalua_bloque(argumentos):
+    problema, bloque, semilla = argumentos
+    #Con hilos el problema y random son los del proceso principal, cambiarlos cambiaria la
+    #busqueda. Con procesos el problema es una copia, así que se le da su propio flujo
+    if semilla is not None and multiprocessing.current_process().name != 'MainProcess':
+        random.seed(semilla)
+        problema.azar = aleatorio.Aleatorio(semilla)
+    return problema.costo_lote(bloque)
+
+
+def cruza_permutaciones(padre, madre, operador='pmx', azar=aleatorio.GLOBAL):
+    """
+    Cruza de dos permutaciones de range(n). Para 'pmx' y 'ox' se sortean dos puntos de
+    corte, 'ciclos' no los necesita. Todos los operadores son O(n).
+    @param padre: Una tupla con un individuo
+    @param madre: Una tupla con otro individuo
+    @param operador: 'pmx', 'ox' o 'ciclos'
+    @param azar: El objeto aleatorio.Aleatorio con el que se sortean los cortes
+    @return: Una lista con los dos hijos (tuplas)
+    """
+    if operador == 'ciclos':
+        return cruza_ciclos(padre, madre)
+    corte1 = azar.randint(0, len(padre)-1)
+    corte2 = azar.randint(corte1+1, len(padre))
+    return OPERADORES_CRUZA[operador](padre, madre, corte1, corte2)
+
+
+def cruza_pmx(padre, madre, corte1, corte2):
+    """
+    Cruza parcialmente mapeada (PMX). Cada hijo conserva el segmento [corte1, corte2) de
+    uno de los padres y fuera de él toma los genes del otro, siguiendo el mapeo del
+    segmento cuando un gen ya está en él.
+    """
+    n = len(padre)
+    hijos = [0] * (2 * n)
+    cruza_pmx_en(padre, madre, hijos, 0, n, corte1, corte2, auxiliares_pmx(n))
+    return [tuple(hijos[:n]), tuple(hijos[n:])]
+
+
+def auxiliares_pmx(n):
+    """
+    Arreglos de trabajo para cruza_pmx_en, que pueden reutilizarse entre cruzas
+    """
+    return [0] * n, [0] * n, [False] * n, [False] * n
+
+
+def cruza_pmx_en(padre, madre, destino, inicio1, inicio2, corte1, corte2, auxiliares,
+                 n=None, base_padre=0, base_madre=0):
+    """
+    PMX escribiendo los hijos directamente en destino[inicio1:inicio1+n] y
+    destino[inicio2:inicio2+n], por ejemplo en el arreglo de una PoblacionCompacta.
+
+    En lugar de buscar en el segmento con slices e index, se usan arreglos de valor a
+    posición y un arreglo de pertenencia al segmento. Las cadenas del mapeo son ajenas
+    entre sí, así que todo el recorrido es O(n).
+
+    Los padres pueden leerse a partir de un desplazamiento dentro de un arreglo más
+    grande (padre[base_padre:base_padre+n]), así que los padres de una PoblacionCompacta
+    se leen de su arreglo sin copiarlos. destino no debe ser el arreglo de los padres.
+
+    @param auxiliares: Los arreglos de auxiliares_pmx(n), que se dejan como estaban
+    @param n: La longitud de los individuos, por default len(padre)
+    @param base_padre: Dónde empieza el padre en padre
+    @param base_madre: Dónde empieza la madre en madre
+    """
+    if n is None:
+        n = len(padre)
+    bp, bm = base_padre, base_madre
+    pos_padre, pos_madre, en_padre, en_madre = auxiliares
+    for i in xrange(n):
+        pos_padre[padre[bp + i]] = i
+        pos_madre[madre[bm + i]] = i
+    for i in xrange(corte1, corte2):
+        x, y = padre[bp + i], madre[bm + i]
+        en_padre[x] = en_madre[y] = True
+        destino[inicio1 + i] = x
+        destino[inicio2 + i] = y
+
+    for i in chain(xrange(corte1), xrange(corte2, n)):
+        x = madre[bm + i]
+        while en_padre[x]:
+            x = madre[bm + pos_padre[x]]
+        destino[inicio1 + i] = x
+        y = padre[bp + i]
+        while en_madre[y]:
+            y = padre[bp + pos_madre[y]]
+        destino[inicio2 + i] = y
+
+    for i in xrange(corte1, corte2):
+        en_padre[padre[bp + i]] = False
+        en_madre[madre[bm + i]] = False
+
+
+def cruza_permutaciones_compacta(poblacion, p, m, hijos, h, operador='pmx', azar=aleatorio.GLOBAL):
+    """
+    Igual que cruza_permutaciones pero entre PoblacionCompacta: cruza los individuos p y m
+    de poblacion y escribe los hijos en las posiciones h y h + 1 de hijos. Con 'pmx' los
+    padres se leen y los hijos se escriben directamente en los arreglos, sin copias.
+    """
+    if operador != 'pmx':
+        hijo1, hijo2 = cruza_permutaciones(poblacion.individuo(p), poblacion.individuo(m), operador, azar)
+        hijos.pon(h, hijo1)
+        hijos.pon(h + 1, hijo2)
+        return
+    n = poblacion.n
+    corte1 = azar.randint(0, n-1)
+    corte2 = azar.randint(corte1+1, n)
+    cruza_pmx_en(poblacion.datos, poblacion.datos, hijos.datos, h * n, (h + 1) * n,
+                 corte1, corte2, hijos.auxiliares, n, p * n, m * n)
+
+
+def cruza_ox(padre, madre, corte1, corte2):
+    """
+    Cruza por orden (OX). Cada hijo conserva el segmento [corte1, corte2) de uno de los
+    padres y el resto de las posiciones, empezando en corte2 y dando la vuelta, se llena
+    con los genes del otro padre en el orden en que aparecen a partir de corte2. O(n).
+    """
+    return [_cruza_ox(padre, madre, corte1, corte2), _cruza_ox(madre, padre, corte1, corte2)]
+
+
+def _cruza_ox(padre, madre, corte1, corte2):
+    n = len(padre)
+    en_segmento = [False] * n
+    for i in xrange(corte1, corte2):
+        en_segmento[padre[i]] = True
+    hijo = list(padre)
+    k = corte2 % n
+    for i in chain(xrange(corte2, n), xrange(corte2)):
+        x = madre[i]
+        if not en_segmento[x]:
+            hijo[k] = x
+            k = (k + 1) % n
+    return tuple(hijo)
+
+
+def cruza_ciclos(padre, madre):
+    """
+    Cruza por ciclos (CX). Las posiciones se dividen en los ciclos que forman padre y
+    madre, y los hijos toman alternadamente un ciclo de cada padre, así cada gen queda en
+    una posición que tenía en alguno de los padres. O(n).
+    """
+    n = len(padre)
+    pos_padre = [0] * n
+    for i in xrange(n):
+        pos_padre[padre[i]] = i
+    hijo1, hijo2 = list(padre), list(madre)
+    visitado = [False] * n
+    impar = False
+    for inicio in xrange(n):
+        if visitado[inicio]:
+            continue
+        i = inicio
+        while not visitado[i]:
+            visitado[i] = True
+            if impar:
+                hijo1[i], hijo2[i] = madre[i], padre[i]
+            i = pos_padre[madre[i]]
+        impar = not impar
+    return [tuple(hijo1), tuple(hijo2)]
+
+
+OPERADORES_CRUZA = {'pmx': cruza_pmx, 'ox': cruza_ox, 'ciclos': cruza_ciclos}
+
+
+def muta_insercion(secuencia, i, j):
+    """
+    Mutación por inserción en su lugar: el gen de la posición i pasa a la posición j
+    (i < j) y los genes de i + 1 a j se recorren una posición a la izquierda.
+
+    Los operadores de mutación reciben cualquier secuencia mutable que acepte
+    asignación de slices (una lista, un array('H') con toda una población, en cuyo caso
+    i y j ya incluyen el desplazamiento del individuo, o un renglón de numpy).
+    """
+    primero = secuencia[i]
+    secuencia[i:j] = secuencia[i + 1:j + 1]
+    secuencia[j] = primero
+
+
+def muta_intercambio(secuencia, i, j):
+    """ Mutación por intercambio de los genes de las posiciones i y j, en su lugar """
+    secuencia[i], secuencia[j] = secuencia[j], secuencia[i]
+
+
+def muta_inversion(secuencia, i, j):
+    """ Mutación por inversión del segmento de i a j (inclusive), en su lugar """
+    secuencia[i:j + 1] = secuencia[i:j + 1][::-1]
+
+
+def muta_revoltura(secuencia, i, j, azar=aleatorio.GLOBAL):
+    """ Mutación que revuelve al azar el segmento de i a j (inclusive), en su lugar """
+    segmento = secuencia[i:j + 1]
+    azar.shuffle(segmento)
+    secuencia[i:j + 1] = segmento
+
+
+OPERADORES_MUTACION = {'insercion': muta_insercion, 'intercambio': muta_intercambio,
+                       'inversion': muta_inversion, 'revoltura': muta_revoltura}
+
+
+def sorteo_geometrico(total, p, azar=aleatorio.GLOBAL):
+    """
+    Elige posiciones de range(total), cada una en forma independiente con probabilidad
+    p, sin sortear posición por posición: la distancia entre dos posiciones elegidas
+    sigue una distribución geométrica, así que se hace un sorteo por posición elegida.
+    @param total: Número de posiciones
+    @param p: Probabilidad de elegir cada posición
+    @param azar: Un objeto aleatorio.Aleatorio
+    @return: Un generador de las posiciones elegidas, en orden creciente
+    """
+    if p <= 0:
+        return
+    if p >= 1:
+        for posicion in xrange(total):
+            yield posicion
+        return
+    log_q = log(1.0 - p)
+    random = azar.random
+    posicion = -1
+    while True:
+        posicion += 1 + int(log(1.0 - random()) / log_q)
+        if posicion >= total:
+            return
+        yield posicion
+
+
+def sorteo_geometrico_matriz(total, p, azar=aleatorio.GLOBAL):
+    """
+    Lo mismo que sorteo_geometrico con numpy
+    @return: Un arreglo de numpy con las posiciones elegidas, en orden creciente
+    """
+    if p <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(total)
+    posiciones, ultima = [], -1
+    while True:
+        #Se sortean de más para que casi siempre baste con un sorteo
+        saltos = azar.numpy.geometric(p, int(total * p + 4 * (total * p) ** 0.5) + 16)
+        nuevas = ultima + np.cumsum(saltos)
+        posiciones.append(nuevas[nuevas < total])
+        if nuevas[-1] >= total:
+            return np.concatenate(posiciones)
+        ultima = nuevas[-1]
+
+
+class _MejorEncontrado(object):
+    """
+    El mejor individuo que lleva Genetico.busqueda_iter. Tiene getstate y setstate para
+    registrarlo en un punto de control igual que un generador aleatorio
+    """
+    def __init__(self):
+        self.estado = self.costo = None
+
+    def getstate(self):
+        return self.estado, self.costo
+
+    def setstate(self, estado):
+        self.estado, self.costo = estado
+
+
+class PoblacionCompacta(object):
+    """
+    Población de tam individuos de longitud n guardada en un solo array('H') contiguo,
+    un individuo tras otro. Sirve para permutaciones de range(n) con n < 65536.
+
+    Los individuos se identifican por su índice y se modifican en su lugar, sin crear
+    una tupla por individuo.
+    """
+    def __init__(self, capacidad, n):
+        """
+        @param capacidad: Número máximo de individuos
+        @param n: Longitud de cada individuo
+        """
+        self.n = n
+        self.tam = 0
+        self.datos = array('H', [0]) * (capacidad * n)
+        self.auxiliares = auxiliares_pmx(n)
+
+    def __len__(self):
+        return self.tam
+
+    def individuo(self, k):
+        """ El individuo k como tupla """
+        return tuple(self.datos[k * self.n:(k + 1) * self.n])
+
+    __getitem__ = individuo
+
+    def clave(self, k):
+        """
+        Cadena con los bytes del individuo k, para usarla en una cache. Es una cadena
+        nueva de 2n bytes en cada llamada
+        """
+        return self.datos[k * self.n:(k + 1) * self.n].tostring()
+
+    def pon(self, k, individuo):
+        """ Escribe un individuo (cualquier secuencia) en la posición k """
+        self.datos[k * self.n:(k + 1) * self.n] = array('H', individuo)
+
+    def copia(self, k, origen, j):
+        """ Copia el individuo j de otra población en la posición k """
+        n = self.n
+        self.datos[k * n:(k + 1) * n] = origen.datos[j * n:(j + 1) * n]
+
+    def intercambia(self, k, i, j):
+        """ Intercambia los genes i y j del individuo k """
+        datos, base = self.datos, k * self.n
+        datos[base + i], datos[base + j] = datos[base + j], datos[base + i]
+
+
+class GestorDiversidad(object):
+    """
+    Quita los individuos repetidos de cada generación y sigue la diversidad de la
+    población (ver Genetico.busqueda). Ejemplo:
+
+        gestor = GestorDiversidad()
+        algoritmo.busqueda(problema, 1, 10000, 100, diversidad=gestor)
+        print gestor.duplicados, gestor.traza[-1]
+
+    De cada generación sólo se guarda el hash de sus individuos (un entero por individuo),
+    así que la memoria es O(n_poblacion) sin importar el tamaño de los individuos. Si dos
+    individuos distintos tuvieran el mismo hash, uno se reemplazaría sin necesidad, lo que
+    no afecta a la búsqueda. La diversidad se estima con un número fijo de parejas (ver
+    instrumentacion.diversidad), así que su costo no crece con la población.
+    """
+    def __init__(self, reemplazo='vecino', intentos=8, muestras=32, semilla=0):
+        """
+        @param reemplazo: 'vecino' para cambiar un individuo repetido por un vecino suyo
+                          (problema.vecino_aleatorio) que no esté en la población, o
+                          'aleatorio' para cambiarlo por problema.estado_aleatorio()
+        @param intentos: Cuántos vecinos se prueban antes de recurrir a un estado aleatorio
+        @param muestras: Parejas con las que se estima la diversidad (0 para no estimarla)
+        @param semilla: Semilla del generador propio con el que se eligen las parejas, para
+                        no alterar la secuencia aleatoria de la búsqueda
+        """
+        if reemplazo not in ('vecino', 'aleatorio'):
+            raise ValueError("Reemplazo desconocido: " + str(reemplazo))
+        self.reemplazo = reemplazo
+        self.intentos = intentos
+        self.muestras = muestras
+        self._azar = random.Random(semilla)
+        self.inicia()
+
+    def inicia(self):
+        """
+        Borra las cuentas. Las búsquedas lo llaman al empezar.
+        """
+        self.duplicados = 0
+        self.traza = []
+
+    def depura(self, poblacion, problema, generacion=None):
+        """
+        Reemplaza a los individuos repetidos de una población. Se conserva la última
+        aparición de cada individuo, así que la élite (que se agrega al final) nunca se
+        reemplaza.
+
+        @param poblacion: Una lista de individuos (tuplas)
+        @param problema: El problema, para generar los reemplazos
+        @param generacion: Opcional, la generación con la que se agrega un registro a
+                           self.traza con los duplicados y la diversidad
+        @return: Una lista nueva con la población sin repetidos
+
+        """
+        vistos = set()
+        depurada = list(poblacion)
+        duplicados = 0
+        for k in xrange(len(depurada) - 1, -1, -1):
+            individuo = depurada[k]
+            llave = hash(individuo)
+            if llave in vistos:
+                duplicados += 1
+                individuo = self._reemplazo(individuo, problema, vistos)
+                depurada[k] = individuo
+                llave = hash(individuo)
+            vistos.add(llave)
+        self.duplicados += duplicados
+        if generacion is not None:
+            registro = {'generacion': generacion, 'duplicados': duplicados}
+            if self.muestras:
+                registro['diversidad'] = instrumentacion.diversidad(depurada, self.muestras, self._azar)
+            self.traza.append(registro)
+        return depurada
+
+    def _reemplazo(self, individuo, problema, vistos):
+        if self.reemplazo == 'vecino':
+            #Caminata aleatoria corta desde el repetido hasta salir de la población
+            for _ in xrange(self.intentos):
+                individuo = problema.vecino_aleatorio(individuo)
+                if hash(individuo) not in vistos:
+                    return individuo
+        #Si la población ya tiene casi todos los estados posibles, el último puede repetirse
+        return problema.estado_aleatorio()
 
 
 class Genetico:
     """
     Clase genérica para un algoritmo genético.
     Contiene el algoritmo genético general y las clases abstractas.
+    Los sorteos de los operadores se hacen con self.azar, un objeto aleatorio.Aleatorio
+    (por default aleatorio.GLOBAL).
     """
+    azar = aleatorio.GLOBAL
 
-    def busqueda(self, problema,Hacer_C, n_poblacion=10, n_generaciones=30, elitismo=True):
+    def busqueda(self, problema,Hacer_C, n_poblacion=10, n_generaciones=30, elitismo=True, tam_cache=None,
+                 motor='tuplas', ejecutor=None, tam_bloque=None, semilla=None, criterios=None,
+                 informe=None, instrumentos=None, punto_control=None, diversidad=None):
         """
         Algoritmo genético general
         @param problema: Un objeto de la clase blocal.problema
         @param n_poblacion: Entero con el tamaño de la población
         @param n_generaciones: Número de generaciones a simular
         @param elitismo: Booleano, para aplicar o no el elitismo
+        @param tam_cache: Máximo de individuos cuyo costo se memoriza (por default
+                          el doble de la población, suficiente para conservar a la élite)
+        @param motor: 'tuplas' para representar a cada individuo con una tupla, 'numpy'
+                      para guardar toda la población en un arreglo de dos dimensiones
+                      (ver busqueda_matriz) o 'compacto' para guardarla en un array('H')
+                      (ver busqueda_compacta)
+        @param ejecutor: Opcional, para evaluar el costo en paralelo (sólo con motor 'tuplas').
+                         Un objeto con el método map como el que devuelve crea_ejecutor, que
+                         se reutiliza en todas las generaciones, o bien 'procesos' o 'hilos'
+                         para crear uno que se cierra al terminar la búsqueda
+        @param tam_bloque: Individuos por bloque al evaluar en paralelo (ver evalua_en_paralelo,
+                           sólo con motor 'tuplas')
+        @param semilla: Semilla para las semillas de los bloques evaluados en paralelo (sólo
+                        con motor 'tuplas')
+        @param criterios: Una lista opcional de criterios de paro (ver blocales.Criterio), que
+                          se revisan al inicio de cada generación con el mejor costo de la
+                          población y el número de individuos evaluados
+        @param informe: Un diccionario opcional donde se reporta cómo terminó la búsqueda
+                        (ver blocales.llena_informe). El criterio es 'generaciones' si se
+                        completaron todas, o el nombre del criterio de paro que se cumplió
+        @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional, que mide el
+                             tiempo de las fases 'costo', 'aptitud', 'seleccion', 'cruza' y
+                             'mutacion' y registra cada generación
+        @param punto_control: Un objeto puntos_control.PuntoControl opcional (sólo con motor
+                              'tuplas'). Si su archivo existe la búsqueda se reanuda desde
+                              ahí, y al inicio de cada generación se guarda un punto de
+                              control si ya pasaron punto_control.segundos
+        @param diversidad: Un objeto GestorDiversidad opcional (sólo con motor 'tuplas'),
+                           que reemplaza a los individuos repetidos de la población inicial
+                           y de cada generación nueva
         @return: Un estado del problema
         """
-        poblacion = [problema.estado_aleatorio() for _ in range(n_poblacion)]
-        if Hacer_C == 2:
-            for _ in range(n_generaciones):
+        if punto_control is not None and motor != 'tuplas':
+            raise ValueError("Los puntos de control sólo se pueden usar con el motor 'tuplas'")
+        if diversidad is not None and motor != 'tuplas':
+            raise ValueError("El gestor de diversidad sólo se puede usar con el motor 'tuplas'")
+        if (ejecutor is not None or tam_bloque is not None or semilla is not None) and motor != 'tuplas':
+            raise ValueError("La evaluación en paralelo (ejecutor, tam_bloque y semilla) sólo se "
+                             "puede usar con el motor 'tuplas'")
+        criterios = blocales.inicia_criterios(criterios)
+        if instrumentos is not None:
+            instrumentos.inicia()
+        if motor == 'numpy':
+            return self.busqueda_matriz(problema, Hacer_C, n_poblacion, n_generaciones, elitismo,
+                                        criterios, informe, instrumentos)
+        if motor == 'compacto':
+            return self.busqueda_compacta(problema, Hacer_C, n_poblacion, n_generaciones, elitismo,
+                                          tam_cache, criterios, informe, instrumentos)
+        if motor != 'tuplas':
+            raise ValueError("Motor desconocido: " + str(motor))
+
+        for _, poblacion, costos in self._busqueda_tuplas(problema, Hacer_C, n_poblacion, n_generaciones,
+                                                          elitismo, tam_cache, ejecutor, tam_bloque, semilla,
+                                                          criterios, informe, instrumentos, punto_control,
+                                                          diversidad):
+            pass
+        return poblacion[costos.index(min(costos))]
+
+    def busqueda_iter(self, problema, Hacer_C, n_poblacion=10, n_generaciones=30, elitismo=True,
+                      tam_cache=None, ejecutor=None, tam_bloque=None, semilla=None, criterios=None,
+                      informe=None, instrumentos=None, punto_control=None, diversidad=None):
+        """
+        Versión generadora de busqueda (con motor 'tuplas'): en lugar de devolver sólo el
+        resultado, entrega el progreso de cada generación. Quien la usa puede detenerla en
+        cualquier momento, o seguir otra búsqueda desde el mejor estado. Ejemplo:
+
+            for progreso in algoritmo.busqueda_iter(problema, 1, 64, 1000):
+                print progreso.iteracion, progreso.costo
+                if progreso.costo == 0:
+                    break
+
+        Los parámetros son los de busqueda. El informe se llena y el punto de control se
+        borra sólo si el generador se agota. El mejor estado encontrado también se guarda en
+        el punto de control, así que al reanudar el progreso es el mismo que sin interrupción.
+
+        @return: Un generador de objetos blocales.Progreso con la generación, el mejor
+                 estado y su costo encontrados hasta ese momento, y las evaluaciones hechas.
+                 El último corresponde a la población final
+
+        """
+        criterios = blocales.inicia_criterios(criterios)
+        if instrumentos is not None:
+            instrumentos.inicia()
+        mejor = _MejorEncontrado()
+        if punto_control is not None:
+            #Se registra antes de que _busqueda_tuplas cargue el punto de control
+            punto_control.registra_generador('mejor', mejor)
+        for generacion, poblacion, costos in self._busqueda_tuplas(problema, Hacer_C, n_poblacion,
+                                                                   n_generaciones, elitismo, tam_cache,
+                                                                   ejecutor, tam_bloque, semilla, criterios,
+                                                                   informe, instrumentos, punto_control,
+                                                                   diversidad):
+            c = min(costos)
+            if mejor.costo is None or c < mejor.costo:
+                mejor.estado, mejor.costo = poblacion[costos.index(c)], c
+            yield blocales.Progreso(generacion, mejor.estado, mejor.costo, self.cache_costo.fallos)
+
+    def _busqueda_tuplas(self, problema, Hacer_C, n_poblacion, n_generaciones, elitismo,
+                         tam_cache, ejecutor, tam_bloque, semilla, criterios, informe, instrumentos,
+                         punto_control, diversidad):
+        """
+        Generador con el trabajo de busqueda y busqueda_iter: entrega (generacion,
+        poblacion, costos) en cada generación, y al final la población final con sus costos
+        """
+        propio = isinstance(ejecutor, basestring)
+        if propio:
+            ejecutor = crea_ejecutor(ejecutor)
+        try:
+            for avance in self._evoluciona_tuplas(problema, Hacer_C, n_poblacion, n_generaciones, elitismo,
+                                                  tam_cache, ejecutor, tam_bloque, semilla, criterios,
+                                                  informe, instrumentos, punto_control, diversidad):
+                yield avance
+        finally:
+            if propio:
+                ejecutor.close()
+                ejecutor.join()
+
+    def _evoluciona_tuplas(self, problema, Hacer_C, n_poblacion, n_generaciones, elitismo,
+                           tam_cache, ejecutor, tam_bloque, semilla, criterios, informe, instrumentos,
+                           punto_control, diversidad):
+        #Todas las llamadas al costo pasan por la cache, asi cada individuo distinto
+        #se evalua una sola vez aunque se consulte para la aptitud, la elite y la solucion.
+        #Queda en self.cache_costo para consultar los aciertos y fallos.
+        costo = self.cache_costo = CacheCosto(problema.costo, tam_cache or 2 * (n_poblacion + 1),
+                                              problema.costo_lote)
+        evalua = None
+        if ejecutor is not None:
+            semillas = random.Random(semilla) if semilla is not None else None
+            evalua = lambda pob: evalua_en_paralelo(ejecutor, problema, pob, tam_bloque, semillas)
+            if punto_control is not None and semillas is not None:
+                punto_control.registra_generador('semillas', semillas)
+        if punto_control is not None:
+            punto_control.registra_generador('azar', self.azar)
+            punto_control.registra_generador('azar_problema', problema.azar)
+        if informe is None:
+            informe = {}
+
+        datos = punto_control.carga() if punto_control is not None else None
+        if diversidad is not None:
+            diversidad.inicia()
+        if datos is None:
+            poblacion, inicio = [problema.estado_aleatorio() for _ in range(n_poblacion)], 0
+            if diversidad is not None:
+                poblacion = diversidad.depura(poblacion, problema)
+        else:
+            poblacion, inicio = datos['poblacion'], datos['generacion']
+            costo.restaura(datos['cache'])
+            puntos_control.restaura_criterios(criterios, datos['criterios'])
+        for avance in self.evoluciona_iter(problema, poblacion, costo, Hacer_C, n_poblacion, n_generaciones,
+                                           elitismo, evalua, criterios, informe, instrumentos, punto_control,
+                                           inicio, diversidad):
+            yield avance
+        _, poblacion, costos = avance
+        blocales.llena_informe(informe, informe['criterio'], informe['iteraciones'],
+                               costo.fallos, min(costos))
+        if instrumentos is not None and informe['criterio'] == 'generaciones':
+            instrumentos.registra(n_generaciones, costo.fallos, costos, poblacion)
+        if punto_control is not None:
+            punto_control.termina()
+
+    def evoluciona(self, problema, poblacion, costo, Hacer_C, n_poblacion, n_generaciones,
+                   elitismo=True, evalua=None, criterios=None, informe=None, instrumentos=None,
+                   punto_control=None, inicio=0, diversidad=None):
+        """
+        Avanza una población un número de generaciones, con los métodos de la subclase.
+        Los parámetros son los de evoluciona_iter.
+        @return: La población después de n_generaciones
+        """
+        for _, poblacion, _ in self.evoluciona_iter(problema, poblacion, costo, Hacer_C, n_poblacion,
+                                                    n_generaciones, elitismo, evalua, criterios, informe,
+                                                    instrumentos, punto_control, inicio, diversidad):
+            pass
+        return poblacion
+
+    def evoluciona_iter(self, problema, poblacion, costo, Hacer_C, n_poblacion, n_generaciones,
+                        elitismo=True, evalua=None, criterios=None, informe=None, instrumentos=None,
+                        punto_control=None, inicio=0, diversidad=None):
+        """
+        Generador que avanza una población un número de generaciones, con los métodos de
+        la subclase
+        @param problema: Un objeto de la clase blocal.problema
+        @param poblacion: Una lista de individuos
+        @param costo: Un objeto CacheCosto con el costo del problema
+        @param evalua: Función opcional para evaluar lotes de individuos (ver CacheCosto.lote)
+        @param criterios: Lista opcional de criterios de paro ya iniciados
+        @param informe: Diccionario opcional donde se guarda el criterio que detuvo la
+                        evolución y el número de generaciones completadas
+        @param instrumentos: Un objeto instrumentacion.Instrumentacion opcional
+        @param punto_control: Un objeto puntos_control.PuntoControl opcional, en el que se
+                              guarda la población, la cache y los criterios
+        @param inicio: La generación en que se empieza (al reanudar desde un punto de control)
+        @param diversidad: Un objeto GestorDiversidad opcional, con el que se quitan los
+                           repetidos de cada generación nueva (se mide como la fase 'diversidad')
+        Los demás parámetros son los de busqueda.
+        @return: Un generador de tuplas (generacion, poblacion, costos), una por generación
+                 en cuanto se evalúa su población, y si se completan las n_generaciones una
+                 última con la población final
+        """
+        medir = instrumentos is not None
+        criterio, generaciones = 'generaciones', n_generaciones
+        for generacion in range(inicio, n_generaciones):
+            if punto_control is not None and punto_control.toca():
+                punto_control.guarda(generacion=generacion, poblacion=poblacion, cache=costo.instantanea(),
+                                     criterios=criterios)
+            if medir:
+                t = time.time()
+            costos = costo.lote(poblacion, evalua)
+            if medir:
+                t = instrumentos.acumula('costo', t)
+                instrumentos.registra(generacion, costo.fallos, costos, poblacion)
+            yield generacion, poblacion, costos
+            fin = blocales.revisa_criterios(criterios, generacion, min(costos), costo.fallos) if criterios else None
+            if fin is not None:
+                criterio, generaciones = fin, generacion
+                break
+            if Hacer_C == 2:
                 #Como usaremos la selecion por ruleta. 
                 #Se ultiliza dos funciones para el calculo de la aptitud. 
                 #La primera parte, realiza la suma del costo de TODA la Poblacion
                 #Esto se puede hacer en una sola funcion de aptiud, pero realisar la suma Total de las aptitudes
                 #para calcular la aoptitud de cada individuo. Seria gasto de tiempo. 
                 #Por cada generacion de la poblacion, solo se necesita hacer la suma total de las aptitudes una sola ves. 
-                Costo_Total = self.calcula_aptitud2(poblacion,problema.costo)
+                Costo_Total = self.calcula_aptitud2(poblacion, costo)
                 #La segunda, saca el porcentaje de la poblacion. Por individuo. 
                 #El costo total es el 100% y cada individuo tiene una x parte de ese costo.
                 #Aqui se hace el cambio: En lugar de usar porcentaje entre 0 y 100 usamos numeros entre 0 y 1
-                aptitud = [self.calcula_aptitud(individuo,problema.costo, Costo_Total) for individuo in poblacion]
+                aptitud = [self.calcula_aptitud(individuo, costo, Costo_Total) for individuo in poblacion]
+            else:
+                aptitud = [self.calcula_aptitud(individuo, costo) for individuo in poblacion]
+            if medir:
+                t = instrumentos.acumula('aptitud', t)
 
-                elite = min(poblacion, key=problema.costo) if elitismo else None
+            elite = poblacion[costos.index(min(costos))] if elitismo else None
 
-                padres, madres = self.seleccion(poblacion, aptitud)
+            padres, madres = self.seleccion(poblacion, aptitud)
+            if medir:
+                t = instrumentos.acumula('seleccion', t)
 
-                poblacion = self.mutacion(self.cruza_listas(padres, madres))
+            hijos = self.cruza_listas(padres, madres)
+            if medir:
+                t = instrumentos.acumula('cruza', t)
 
-                poblacion = poblacion[:n_poblacion]
+            poblacion = self.mutacion(hijos)
+            if medir:
+                t = instrumentos.acumula('mutacion', t)
 
-                if elitismo:
-                    poblacion.append(elite)
+            poblacion = poblacion[:n_poblacion]
 
-            e = min(poblacion, key=problema.costo)
-        else:
-            for _ in range(n_generaciones):
+            if elitismo:
+                poblacion.append(elite)
+
+            if diversidad is not None:
+                poblacion = diversidad.depura(poblacion, problema, generacion + 1)
+                if medir:
+                    instrumentos.acumula('diversidad', t)
+
+        if informe is not None:
+            informe.update(criterio=criterio, iteraciones=generaciones)
+        if criterio == 'generaciones':
+            yield n_generaciones, poblacion, costo.lote(poblacion, evalua)
+
+    def busqueda_matriz(self, problema, Hacer_C, n_poblacion=10, n_generaciones=30, elitismo=True,
+                        criterios=None, informe=None, instrumentos=None):
+        """
+        Algoritmo genético general con la población guardada en un arreglo de numpy de
+        n_poblacion x n. Usa los métodos *_matriz, que por default recurren a los métodos
+        con tuplas, así que cualquier subclase funciona y las que los sobreescriben
+        trabajan con toda la población en operaciones de arreglos.
+
+        Si el problema tiene el método costo_matriz, el costo de toda la población se
+        calcula en una sola llamada.
+
+        Los parámetros son los mismos de busqueda. Hacer_C se conserva por compatibilidad,
+        la aptitud de cada subclase la define aptitud_matriz.
+        @return: Un estado del problema (tupla)
+        """
+        if np is None:
+            raise ImportError("El motor 'numpy' requiere tener instalado numpy")
+        costo_matriz = getattr(problema, 'costo_matriz', None)
+        if costo_matriz is None:
+            costo_matriz = lambda pob: np.array(problema.costo_lote([tuple(ind) for ind in pob]))
+
+        poblacion = np.array([problema.estado_aleatorio() for _ in range(n_poblacion)])
+        medir = instrumentos is not None
+        criterio, generaciones, evaluaciones = 'generaciones', n_generaciones, 0
+        for generacion in range(n_generaciones):
+            if medir:
+                t = time.time()
+            costos = costo_matriz(poblacion)
+            evaluaciones += len(costos)
+            if medir:
+                t = instrumentos.acumula('costo', t)
+                instrumentos.registra(generacion, evaluaciones, costos.tolist(), poblacion)
+            fin = blocales.revisa_criterios(criterios, generacion, costos.min(), evaluaciones) if criterios else None
+            if fin is not None:
+                criterio, generaciones = fin, generacion
+                break
+            aptitud = self.aptitud_matriz(costos)
+            if medir:
+                t = instrumentos.acumula('aptitud', t)
+
+            elite = poblacion[costos.argmin()] if elitismo else None
+
+            padres, madres = self.seleccion_matriz(poblacion, aptitud)
+            if medir:
+                t = instrumentos.acumula('seleccion', t)
+
+            hijos = self.cruza_matriz(padres, madres)
+            if medir:
+                t = instrumentos.acumula('cruza', t)
+
+            poblacion = self.mutacion_matriz(hijos)[:n_poblacion]
+            if medir:
+                instrumentos.acumula('mutacion', t)
+
+            if elitismo:
+                poblacion = np.vstack((poblacion, elite))
+
+        costos = costo_matriz(poblacion)
+        blocales.llena_informe(informe, criterio, generaciones, evaluaciones + len(costos), int(costos.min()))
+        if medir and criterio == 'generaciones':
+            instrumentos.registra(n_generaciones, evaluaciones + len(costos), costos.tolist(), poblacion)
+        return tuple(int(x) for x in poblacion[costos.argmin()])
+
+    def aptitud_matriz(self, costos):
+        """
+        Aptitud de toda la población a partir de un arreglo de costos, equivalente
+        a calcula_aptitud.
+        """
+        return 1.0 / (1.0 + costos)
+
+    def seleccion_matriz(self, poblacion, aptitud):
+        """
+        Selección sobre una población en arreglo. Por default utiliza seleccion.
+        @return: Dos arreglos de individuos, padres y madres
+        """
+        padres, madres = self.seleccion([tuple(ind) for ind in poblacion], list(aptitud))
+        return np.array(padres), np.array(madres)
+
+    def cruza_matriz(self, padres, madres):
+        """
+        Cruza renglón a renglón dos arreglos de individuos. Por default utiliza cruza.
+        @return: Un arreglo con los hijos
+        """
+        return np.array(self.cruza_listas([tuple(ind) for ind in padres],
+                                          [tuple(ind) for ind in madres]))
+
+    def mutacion_matriz(self, poblacion):
+        """
+        Mutación de una población en arreglo. Por default utiliza mutacion.
+        @return: El arreglo con la población mutada
+        """
+        return np.array(self.mutacion([tuple(ind) for ind in poblacion]))
+
+    def busqueda_compacta(self, problema, Hacer_C, n_poblacion=10, n_generaciones=30, elitismo=True,
+                          tam_cache=None, criterios=None, informe=None, instrumentos=None):
+        """
+        Algoritmo genético general con la población en dos PoblacionCompacta que se alternan
+        entre generaciones: los hijos se escriben directamente en la población de la
+        siguiente generación y se mutan en su lugar, así que en cada generación no se crean
+        tuplas ni listas por individuo.
+
+        Lo que sí se crea por individuo en cada generación es su clave para la cache
+        (PoblacionCompacta.clave, una cadena con sus 2n bytes), y para los que no están en
+        la cache el array('H') que recibe problema.costo. Si cruza_compacta o
+        mutacion_compacta no se redefinen para trabajar en su lugar (como en
+        GeneticoPermutaciones1), la cruza y la mutación crean además las tuplas que usan
+        cruza y mutacion.
+
+        La aptitud y la selección usan calcula_aptitud (y calcula_aptitud2) y seleccion de
+        la subclase con los índices de los individuos en lugar de los individuos, así
+        que funcionan sin cambios. La cruza y la mutación usan cruza_compacta y
+        mutacion_compacta, que por default recurren a cruza y mutacion con tuplas.
+
+        Los parámetros son los mismos de busqueda.
+        @return: Un estado del problema (tupla)
+        """
+        iniciales = [problema.estado_aleatorio() for _ in range(n_poblacion)]
+        n = len(iniciales[0])
+        actual = PoblacionCompacta(n_poblacion + 1, n)
+        siguiente = PoblacionCompacta(n_poblacion + 1, n)
+        for k, individuo in enumerate(iniciales):
+            actual.pon(k, individuo)
+        actual.tam = n_poblacion
+        del iniciales
+        cache = self.cache_costo = CacheCosto(lambda clave: problema.costo(array('H', clave)),
+                                              tam_cache or 2 * (n_poblacion + 1),
+                                              lambda claves: problema.costo_lote([array('H', clave)
+                                                                                  for clave in claves]))
+        indices = range(n_poblacion + 1)
+
+        medir = instrumentos is not None
+        criterio, generaciones = 'generaciones', n_generaciones
+        for generacion in range(n_generaciones):
+            if medir:
+                t = time.time()
+            costos = cache.lote([actual.clave(k) for k in range(actual.tam)])
+            if medir:
+                t = instrumentos.acumula('costo', t)
+                instrumentos.registra(generacion, cache.fallos, costos, actual)
+            fin = blocales.revisa_criterios(criterios, generacion, min(costos), cache.fallos) if criterios else None
+            if fin is not None:
+                criterio, generaciones = fin, generacion
+                break
 
-                aptitud = [self.calcula_aptitud(individuo, problema.costo) for individuo in poblacion]
+            costo = costos.__getitem__
+            individuos = indices[:actual.tam]
+            if Hacer_C == 2:
+                Costo_Total = self.calcula_aptitud2(individuos, costo)
+                aptitud = [self.calcula_aptitud(k, costo, Costo_Total) for k in individuos]
+            else:
+                aptitud = [self.calcula_aptitud(k, costo) for k in individuos]
+            if medir:
+                t = instrumentos.acumula('aptitud', t)
 
-                elite = min(poblacion, key=problema.costo) if elitismo else None
+            padres, madres = self.seleccion(individuos, aptitud)
+            if medir:
+                t = instrumentos.acumula('seleccion', t)
 
-                padres, madres = self.seleccion(poblacion, aptitud)
+            h = 0
+            for p, m in zip(padres, madres):
+                if h >= n_poblacion:
+                    break
+                self.cruza_compacta(actual, p, m, siguiente, h)
+                h += 2
+            siguiente.tam = min(h, n_poblacion)
+            if medir:
+                t = instrumentos.acumula('cruza', t)
 
-                poblacion = self.mutacion(self.cruza_listas(padres, madres))
+            self.mutacion_compacta(siguiente)
+            if medir:
+                instrumentos.acumula('mutacion', t)
 
-                poblacion = poblacion[:n_poblacion]
+            if elitismo:
+                siguiente.copia(siguiente.tam, actual, costos.index(min(costos)))
+                siguiente.tam += 1
+            actual, siguiente = siguiente, actual
 
-                if elitismo:
-                    poblacion.append(elite)
+        costos = cache.lote([actual.clave(k) for k in range(actual.tam)])
+        blocales.llena_informe(informe, criterio, generaciones, cache.fallos, min(costos))
+        if medir and criterio == 'generaciones':
+            instrumentos.registra(n_generaciones, cache.fallos, costos, actual)
+        return actual.individuo(costos.index(min(costos)))
 
-            e = min(poblacion, key=problema.costo)
-        return e
+    def cruza_compacta(self, poblacion, p, m, hijos, h):
+        """
+        Cruza los individuos p y m de una PoblacionCompacta y escribe los dos primeros hijos
+        en las posiciones h y h + 1 de otra. Por default utiliza cruza.
+        """
+        hijo1, hijo2 = self.cruza(poblacion.individuo(p), poblacion.individuo(m))[:2]
+        hijos.pon(h, hijo1)
+        hijos.pon(h + 1, hijo2)
+
+    def mutacion_compacta(self, poblacion):
+        """
+        Mutación en su lugar de una PoblacionCompacta. Por default utiliza mutacion.
+        """
+        mutados = self.mutacion([poblacion.individuo(k) for k in range(poblacion.tam)])
+        for k, individuo in enumerate(mutados):
+            poblacion.pon(k, individuo)
 
     def calcula_aptitud(self, individuo, costo=None):
         """
@@ -130,12 +1090,19 @@ class GeneticoPermutaciones1(Genetico):
     """
     Clase con un algoritmo genético adaptado a problemas de permutaciones
     """
-    def __init__(self, prob_muta=0.7):
+    def __init__(self, prob_muta=0.7, operador_cruza='pmx', azar=None):
         """
         @param prob_muta : Probabilidad de mutación de un cromosoma (0.01 por defualt)
+        @param operador_cruza: 'pmx', 'ox' o 'ciclos' (ver cruza_permutaciones)
+        @param azar: Un objeto aleatorio.Aleatorio opcional para los sorteos
         """
+        if operador_cruza not in OPERADORES_CRUZA:
+            raise ValueError("Operador de cruza desconocido: " + str(operador_cruza))
         #Agregamos la probabilidad de cruza
         self.prob_muta = prob_muta
+        self.operador_cruza = operador_cruza
+        if azar is not None:
+            self.azar = azar
         self.nombre = 'propuesto por el profesor con prob. de mutación ' + str(prob_muta)
 
     def seleccion(self, poblacion, aptitud):
@@ -144,13 +1111,13 @@ class GeneticoPermutaciones1(Genetico):
         """
         padres = []
         baraja = range(len(poblacion))
-        random.shuffle(baraja)
+        self.azar.shuffle(baraja)
         for (ind1, ind2) in [(baraja[i], baraja[i+1]) for i in range(0, len(poblacion)-1, 2)]:
             ganador = ind1 if aptitud[ind1] > aptitud[ind2] else ind2
             padres.append(poblacion[ganador])
 
         madres = []
-        random.shuffle(baraja)
+        self.azar.shuffle(baraja)
         for (ind1, ind2) in [(baraja[i], baraja[i+1]) for i in range(0, len(poblacion)-1, 2)]:
             ganador = ind1 if aptitud[ind1] > aptitud[ind2] else ind2
             madres.append(poblacion[ganador])
@@ -164,34 +1131,82 @@ class GeneticoPermutaciones1(Genetico):
         @param madre: Una tupla con otro individuo
         @return: Dos individuos resultado de cruzar padre y madre con permutaciones
         """
-        hijo1, hijo2 = list(padre), list(madre)
-        corte1 = random.randint(0, len(padre)-1)
-        corte2 = random.randint(corte1+1, len(padre))
-        for i in range(len(padre)):
-            if i < corte1 or i >= corte2:
-                hijo1[i], hijo2[i] = hijo2[i], hijo1[i]
-                while hijo1[i] in padre[corte1:corte2]:
-                    hijo1[i] = madre[padre.index(hijo1[i])]
-                while hijo2[i] in madre[corte1:corte2]:
-                    hijo2[i] = padre[madre.index(hijo2[i])]
-        return [tuple(hijo1), tuple(hijo2)]
+        return cruza_permutaciones(padre, madre, self.operador_cruza, self.azar)
 
     def mutacion(self, poblacion):
         """
         Mutación para individus con permutaciones. Utiliza la variable local self.prob_muta
+        Cada gen, con probabilidad self.prob_muta, se intercambia con otro gen al azar. Los
+        genes que mutan se sortean con sorteo_geometrico, así que el costo es proporcional
+        al número de mutaciones y no al tamaño de la población por n.
         @param poblacion: Una lista de individuos (tuplas).
         @return: Los individuos mutados
         """
-        poblacion_mutada = []
-        for individuo in poblacion:
-            individuo = list(individuo)
-            for i in range(len(individuo)):
-                if random.random() < self.prob_muta:
-                    k = random.randint(0, len(individuo) - 1)
-                    individuo[i], individuo[k] = individuo[k], individuo[i]
-            poblacion_mutada.append(tuple(individuo))
+        poblacion_mutada = list(poblacion)
+        if not poblacion:
+            return poblacion_mutada
+        n = len(poblacion[0])
+        random = self.azar.random
+        actual, individuo = None, None
+        for posicion in sorteo_geometrico(len(poblacion) * n, self.prob_muta, self.azar):
+            k, i = divmod(posicion, n)
+            if k != actual:
+                if actual is not None:
+                    poblacion_mutada[actual] = tuple(individuo)
+                actual, individuo = k, list(poblacion[k])
+            muta_intercambio(individuo, i, int(random() * n))
+        if actual is not None:
+            poblacion_mutada[actual] = tuple(individuo)
         return poblacion_mutada
 
+    def cruza_compacta(self, poblacion, p, m, hijos, h):
+        cruza_permutaciones_compacta(poblacion, p, m, hijos, h, self.operador_cruza, self.azar)
+
+    def mutacion_compacta(self, poblacion):
+        """
+        La misma mutación que mutacion, intercambiando los genes en su lugar
+        """
+        n, random = poblacion.n, self.azar.random
+        for posicion in sorteo_geometrico(poblacion.tam * n, self.prob_muta, self.azar):
+            k, i = divmod(posicion, n)
+            poblacion.intercambia(k, i, int(random() * n))
+
+    def seleccion_matriz(self, poblacion, aptitud):
+        """
+        Selección por torneo con toda la población a la vez: cada par consecutivo de una
+        permutación aleatoria compite y gana el de mayor aptitud, igual que seleccion.
+        """
+        n_pares = len(poblacion) // 2
+        ganadores = []
+        for _ in range(2):
+            baraja = self.azar.numpy.permutation(len(poblacion))
+            ind1, ind2 = baraja[0:2 * n_pares:2], baraja[1:2 * n_pares:2]
+            ganadores.append(poblacion[np.where(aptitud[ind1] > aptitud[ind2], ind1, ind2)])
+        return ganadores[0], ganadores[1]
+
+    def mutacion_matriz(self, poblacion):
+        """
+        Misma mutación que mutacion pero vectorizada sobre la población: se sortean de una
+        vez todos los genes que mutan (con sorteo_geometrico_matriz) y sus parejas, y se
+        recorren en orden las columnas con algún gen que muta, intercambiando en todos los
+        individuos a la vez.
+        """
+        m, n = poblacion.shape
+        poblacion = poblacion.copy()
+        filas, columnas = np.divmod(sorteo_geometrico_matriz(m * n, self.prob_muta, self.azar), n)
+        if not len(filas):
+            return poblacion
+        parejas = self.azar.indices(n, len(filas))
+        orden = np.argsort(columnas, kind='mergesort')
+        filas, columnas, parejas = filas[orden], columnas[orden], parejas[orden]
+        cortes = np.flatnonzero(np.diff(columnas)) + 1
+        for f, c, k in zip(np.split(filas, cortes), np.split(columnas, cortes), np.split(parejas, cortes)):
+            i = c[0]
+            valor = poblacion[f, i]
+            poblacion[f, i] = poblacion[f, k]
+            poblacion[f, k] = valor
+        return poblacion
+
 
 ################################################################################################
 #  AQUI EMPIEZA LO QUE HAY QUE HACER CON LA TAREA
@@ -201,11 +1216,29 @@ class GeneticoPermutaciones2(Genetico):
     """
     Clase con un algoritmo genético adaptado a problemas de permutaciones
     """
-    def __init__(self, prob_muta):
+    def __init__(self, prob_muta, ruleta='bisect', operador_cruza='pmx', operador_muta='insercion',
+                 azar=None):
         """
         Aqui puedes poner algunos de los parámetros que quieras utilizar en tu clase
+        @param prob_muta: Probabilidad de mutación de un individuo
+        @param ruleta: Forma de sortear en la selección por ruleta, 'bisect' o 'alias'
+        @param operador_cruza: 'pmx', 'ox' o 'ciclos' (ver cruza_permutaciones)
+        @param operador_muta: 'insercion', 'intercambio', 'inversion' o 'revoltura'
+                              (ver OPERADORES_MUTACION)
+        @param azar: Un objeto aleatorio.Aleatorio opcional para los sorteos
         """
+        if ruleta not in ('bisect', 'alias'):
+            raise ValueError("Ruleta desconocida: " + str(ruleta))
+        if operador_cruza not in OPERADORES_CRUZA:
+            raise ValueError("Operador de cruza desconocido: " + str(operador_cruza))
+        if operador_muta not in OPERADORES_MUTACION:
+            raise ValueError("Operador de mutación desconocido: " + str(operador_muta))
         self.prob_muta = prob_muta
+        self.ruleta = ruleta
+        self.operador_cruza = operador_cruza
+        self.operador_muta = operador_muta
+        if azar is not None:
+            self.azar = azar
         self.nombre = 'propuesto por Angelica Maria' + str(prob_muta)
         #
         # ------ IMPLEMENTA AQUI TU CÓDIGO ------------------------------------------------------------------------
@@ -244,44 +1277,27 @@ class GeneticoPermutaciones2(Genetico):
     def seleccion(self, poblacion, aptitud):
         """
         Desarrolla un método específico de selección.
+        Selección por ruleta: cada individuo se elige con probabilidad proporcional a su
+        aptitud. Se sortean exactamente len(poblacion) padres y len(poblacion) madres.
         """
         #####################################################################
         #                          20 PUNTOS
         #####################################################################
         #
         # ------ IMPLEMENTA AQUI TU CÓDIGO ----------------------------------
-        #CodigoPrestado
-        '''
-        Aqui se hace una suma de cada una de los aptitudes de los individuos. 
-        Debe ser iagual a auno.
-        Descomentar para ver la suma de todas las aoptitudes.
-        '''
-        #total = 0
-        #for i in range(len(aptitud)):
-        #    total = total + aptitud[i]
-        #print 'Total: ', total
-        padres = []
-        for ind in range(len(poblacion)):
-            Numero_Aleatorio = random.random() #Numero aleatorio, entre 0 y 1
-            Suma_Porcentajes = 0
-            for ind2 in range(len(poblacion)):
-                Suma_Porcentajes =Suma_Porcentajes + aptitud[ind2] #Se estan sumando las aotitudes
-                if Suma_Porcentajes >= Numero_Aleatorio: #Si es mayor o igual, se agrega
-                    padres.append(poblacion[ind2])
-                    continue
-        madres = []
-        for ind in range(len(poblacion)):
-            Numero_Aleatorio = random.random() #Numero aleatorio, entre 0 y 1
-            Suma_Porcentajes = 0
-            for ind2 in range(len(poblacion)):
-                Suma_Porcentajes =Suma_Porcentajes + aptitud[ind2] #Se estan sumando las aotitudes
-                if Suma_Porcentajes >= Numero_Aleatorio: #Si es mayor o igual, se agrega
-                    madres.append(poblacion[ind2])
-                    continue
-
-
+        #La ruleta se arma una sola vez por generacion y se usa para los padres y las madres.
+        #Con self.ruleta = 'bisect' se busca cada numero aleatorio en las aptitudes acumuladas
+        #por busqueda binaria (O(log n) por sorteo), con 'alias' se usa la tabla de alias de
+        #Walker (O(1) por sorteo).
+        if self.ruleta == 'alias':
+            prob, alias = tabla_alias(aptitud)
+            sorteo = lambda: muestra_alias(prob, alias, len(poblacion), self.azar)
+        else:
+            acumulada = acumula(aptitud)
+            sorteo = lambda: muestra_acumulada(acumulada, len(poblacion), self.azar)
+        padres = [poblacion[ind] for ind in sorteo()]
+        madres = [poblacion[ind] for ind in sorteo()]
         return padres, madres
-        #raise NotImplementedError("¡Este metodo debe ser implementado!")
 
     def cruza(self, padre, madre):
         """
@@ -290,17 +1306,7 @@ class GeneticoPermutaciones2(Genetico):
         @param madre: Una tupla con otro individuo
         @return: Dos individuos resultado de cruzar padre y madre con permutaciones
         """
-        hijo1, hijo2 = list(padre), list(madre)
-        corte1 = random.randint(0, len(padre)-1)
-        corte2 = random.randint(corte1+1, len(padre))
-        for i in range(len(padre)):
-            if i < corte1 or i >= corte2:
-                hijo1[i], hijo2[i] = hijo2[i], hijo1[i]
-                while hijo1[i] in padre[corte1:corte2]:
-                    hijo1[i] = madre[padre.index(hijo1[i])]
-                while hijo2[i] in madre[corte1:corte2]:
-                    hijo2[i] = padre[madre.index(hijo2[i])]
-        return [tuple(hijo1), tuple(hijo2)]
+        return cruza_permutaciones(padre, madre, self.operador_cruza, self.azar)
 
     def mutacion(self, poblacion):
         """
@@ -329,39 +1335,179 @@ class GeneticoPermutaciones2(Genetico):
         Antes:   5,(1),2,4,3,6,9,8,7
         Despues: 5,2,4,3,6,9,8,(1),7
         Nota: Los numeros fuera del rango, no se mueven, ya que no se tienen tomados en cuenta.
+
+        El recorrido se hace con una sola asignación de slices (ver muta_insercion), y con
+        self.operador_muta se puede usar otro operador de OPERADORES_MUTACION. Los
+        individuos que mutan se sortean con sorteo_geometrico.
         '''
-        poblacion_mutada = []
-        i = 0
-        for individuo in poblacion:
-            #El individuo, se muta o no se muta
-            #Se hace lista, para facil manejo
-            individuo = list(individuo)
-            if random.random() < self.prob_muta:
-                
-            #Se hace un ciclo para asegurar que los puntos sean diferentes
-                P_menor=P_mayor=0
-            #mientras los puntos sean iguales el ciclo sigue
-                while P_mayor==P_menor:
-                    P_menor = random.randint(0, len(individuo)-1)
-                    P_mayor = random.randint(0, len(individuo)-1)
-            #cuando sale del ciclo quiere decir que los puntos son diferentes
-            #Se asegura que las variables sean menor o mayor, deacuerdo al nombre de la variable
-            #Nota solo el numero de las posiciones, no el numero en en la posicion del individuo.
-                if P_mayor<P_menor:
-                    k=P_menor
-                    P_menor=P_mayor
-                    P_mayor=k 
-                for P_menor in range(P_mayor):
-                    Dato2=individuo[P_menor]
-                    individuo[P_menor]=individuo[P_menor+1]
-                    individuo[P_menor+1]=Dato2
-            #se agrega el individuo a la poblacion mutada...
-            #Nota: Si se muta ao no el individuo se agrega
-            poblacion_mutada.append(tuple(individuo))    
+        #Si se muta o no el individuo, se agrega a la poblacion mutada
+        poblacion_mutada = list(poblacion)
+        operador = self.operador_mutacion()
+        for k in sorteo_geometrico(len(poblacion), self.prob_muta, self.azar):
+            individuo = list(poblacion[k])
+            #Dos puntos diferentes, P_menor < P_mayor
+            P_menor, P_mayor = sorted(self.azar.pareja(len(individuo)))
+            operador(individuo, P_menor, P_mayor)
+            poblacion_mutada[k] = tuple(individuo)
 
         #se regresa la poblacion mutada.
         return poblacion_mutada
-        #raise NotImplementedError("¡Este metodo debe ser implementado!")
+
+    def operador_mutacion(self):
+        """
+        @return: La función de OPERADORES_MUTACION de self.operador_muta, que en el caso de
+                 la revoltura sortea con self.azar
+        """
+        if self.operador_muta == 'revoltura':
+            return lambda secuencia, i, j: muta_revoltura(secuencia, i, j, self.azar)
+        return OPERADORES_MUTACION[self.operador_muta]
+
+    def cruza_compacta(self, poblacion, p, m, hijos, h):
+        cruza_permutaciones_compacta(poblacion, p, m, hijos, h, self.operador_cruza, self.azar)
+
+    def mutacion_compacta(self, poblacion):
+        """
+        La misma mutación de mutacion, en su lugar sobre el array de la población
+        """
+        n, datos = poblacion.n, poblacion.datos
+        operador = self.operador_mutacion()
+        for k in sorteo_geometrico(poblacion.tam, self.prob_muta, self.azar):
+            P_menor, P_mayor = sorted(self.azar.pareja(n))
+            operador(datos, k * n + P_menor, k * n + P_mayor)
+
+    def aptitud_matriz(self, costos):
+        """
+        Igual que calcula_aptitud: la parte del costo total que le toca a cada individuo.
+        """
+        Costo_Total = costos.sum()
+        if Costo_Total == 0:
+            return np.full(len(costos), 1.0 / len(costos))
+        return costos / float(Costo_Total)
+
+    def seleccion_matriz(self, poblacion, aptitud):
+        """
+        Selección por ruleta de toda la población: se acumulan las aptitudes una sola vez
+        y cada número aleatorio se ubica en la ruleta por búsqueda binaria.
+        """
+        ruleta = np.cumsum(aptitud)
+        m = len(poblacion)
+        padres = np.searchsorted(ruleta, self.azar.uniformes(m) * ruleta[-1])
+        madres = np.searchsorted(ruleta, self.azar.uniformes(m) * ruleta[-1])
+        return poblacion[np.minimum(padres, m - 1)], poblacion[np.minimum(madres, m - 1)]
+
+    def mutacion_matriz(self, poblacion):
+        """
+        La misma mutación de mutacion, aplicada a todos los individuos que mutan con un
+        solo reacomodo de índices. Para la inserción, el gen de P_menor pasa a la posición
+        P_mayor y los genes entre ellos se recorren una posición a la izquierda. La
+        revoltura no tiene reacomodo fijo y se aplica renglón por renglón.
+        """
+        m, n = poblacion.shape
+        filas = sorteo_geometrico_matriz(m, self.prob_muta, self.azar)
+        if not len(filas):
+            return poblacion
+        #Dos puntos distintos, P_menor < P_mayor
+        P_1, P_2 = self.azar.parejas(n, len(filas))
+        P_menor = np.minimum(P_1, P_2)[:, np.newaxis]
+        P_mayor = np.maximum(P_1, P_2)[:, np.newaxis]
+        poblacion = poblacion.copy()
+        if self.operador_muta == 'revoltura':
+            for f, i, j in zip(filas, P_menor[:, 0], P_mayor[:, 0]):
+                segmento = poblacion[f, i:j + 1]
+                segmento[:] = segmento[self.azar.numpy.permutation(len(segmento))]
+            return poblacion
+        posiciones = np.arange(n)
+        dentro = (posiciones >= P_menor) & (posiciones <= P_mayor)
+        if self.operador_muta == 'insercion':
+            indices = np.where(posiciones == P_mayor, P_menor, posiciones + dentro)
+        elif self.operador_muta == 'inversion':
+            indices = np.where(dentro, P_menor + P_mayor - posiciones, posiciones)
+        else:
+            indices = np.where(posiciones == P_menor, P_mayor,
+                               np.where(posiciones == P_mayor, P_menor, posiciones))
+        poblacion[filas] = poblacion[filas[:, np.newaxis], indices]
+        return poblacion
+
+def acumula(aptitud):
+    """
+    Sumas prefijo de las aptitudes, para sortear con muestra_acumulada
+    @param aptitud: Una lista de números no negativos
+    @return: Una lista con las aptitudes acumuladas
+    """
+    acumulada, total = [], 0.0
+    for a in aptitud:
+        total += a
+        acumulada.append(total)
+    return acumulada
+
+
+def muestra_acumulada(acumulada, n, azar=aleatorio.GLOBAL):
+    """
+    Sortea n índices con probabilidad proporcional a la aptitud, buscando cada número
+    aleatorio en las aptitudes acumuladas por búsqueda binaria. O(n log m). Se busca con
+    bisect_right para que un individuo con aptitud cero nunca salga, ni cuando el número
+    aleatorio es 0.0.
+    @param acumulada: Lista generada por acumula
+    @param n: Número de índices a sortear
+    @param azar: Un objeto aleatorio.Aleatorio
+    @return: Una lista de n índices
+    """
+    m = len(acumulada)
+    total = acumulada[-1]
+    random = azar.random
+    if total <= 0:
+        return [int(random() * m) for _ in xrange(n)]
+    ultimo = m - 1
+    return [min(bisect_right(acumulada, random() * total), ultimo) for _ in xrange(n)]
+
+
+def tabla_alias(aptitud):
+    """
+    Construye en O(m) la tabla de alias de Walker para sortear índices con probabilidad
+    proporcional a la aptitud.
+    @param aptitud: Una lista de números no negativos
+    @return: Dos listas, la probabilidad de quedarse en cada casilla y su alias
+    """
+    m = len(aptitud)
+    total = float(sum(aptitud))
+    if total <= 0:
+        return [1.0] * m, range(m)
+    prob = [a * m / total for a in aptitud]
+    alias = range(m)
+    chicos = [i for i in xrange(m) if prob[i] < 1.0]
+    grandes = [i for i in xrange(m) if prob[i] >= 1.0]
+    while chicos and grandes:
+        chico, grande = chicos.pop(), grandes.pop()
+        alias[chico] = grande
+        prob[grande] += prob[chico] - 1.0
+        if prob[grande] < 1.0:
+            chicos.append(grande)
+        else:
+            grandes.append(grande)
+    #Lo que queda fuera es por redondeo, esas casillas se quedan siempre con su indice
+    for i in chicos + grandes:
+        prob[i] = 1.0
+    return prob, alias
+
+
+def muestra_alias(prob, alias, n, azar=aleatorio.GLOBAL):
+    """
+    Sortea n índices con una tabla de alias, O(1) por índice.
+    @param prob: Lista de probabilidades generada por tabla_alias
+    @param alias: Lista de alias generada por tabla_alias
+    @param n: Número de índices a sortear
+    @param azar: Un objeto aleatorio.Aleatorio
+    @return: Una lista de n índices
+    """
+    m = len(prob)
+    random = azar.random
+    indices = []
+    for _ in xrange(n):
+        u = random() * m
+        i = int(u)
+        indices.append(i if u - i < prob[i] else alias[i])
+    return indices
+
 
 def prueba_genetico_nreinas(algo_genetico, problema, n_poblacion, n_generaciones):
     tiempo_inicial = time.time()
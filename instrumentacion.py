@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+instrumentacion.py
+------------
+
+Medición de las búsquedas de blocales.py y genetico.py: tiempos por fase, evaluaciones
+de costo y una traza con el mejor costo, el costo promedio y la diversidad de cada
+generación (o cada cierto número de iteraciones en las búsquedas locales).
+
+Las búsquedas reciben un objeto Instrumentacion en el parámetro instrumentos; si no se
+les da ninguno no miden nada, así que no cuesta nada tenerlo desactivado.
+
+"""
+
+import csv
+import json
+from random import Random
+from time import time
+
+
+class Instrumentacion(object):
+    """
+    Recolecta la información de una búsqueda. Ejemplo:
+
+        instrumentos = Instrumentacion(callbacks=[lambda r: sys.stdout.write(str(r) + '\n')])
+        algoritmo.busqueda(problema, 1, 32, 100, instrumentos=instrumentos)
+        print instrumentos.tiempos
+        instrumentos.exporta_csv('traza.csv')
+
+    """
+    def __init__(self, cada=1, muestras_diversidad=32, callbacks=None, semilla=0):
+        """
+        @param cada: En las búsquedas locales, cada cuántas iteraciones se hace un registro
+        @param muestras_diversidad: Número de parejas de individuos con las que se estima la
+                                    diversidad de una población (0 para no calcularla)
+        @param callbacks: Lista de funciones que se llaman con cada registro (un diccionario)
+                          en cuanto se hace
+        @param semilla: Semilla del generador propio con el que se eligen las parejas, para
+                        no alterar la secuencia aleatoria de la búsqueda
+        """
+        self.cada = cada
+        self.muestras_diversidad = muestras_diversidad
+        self.callbacks = list(callbacks or [])
+        self._azar = Random(semilla)
+        self.inicia()
+
+    def inicia(self):
+        """
+        Borra lo medido. Las búsquedas lo llaman al empezar.
+        """
+        self.tiempos = {}
+        self.traza = []
+        self.inicio = time()
+
+    def acumula(self, fase, desde):
+        """
+        Suma al tiempo de una fase el tiempo transcurrido desde un instante
+
+        @param fase: El nombre de la fase
+        @param desde: El instante (de time.time()) en que empezó la fase
+
+        @return: El instante actual, para usarlo como inicio de la siguiente fase
+
+        """
+        ahora = time()
+        self.tiempos[fase] = self.tiempos.get(fase, 0.0) + ahora - desde
+        return ahora
+
+    def registra(self, iteracion, evaluaciones, costos=None, poblacion=None, **datos):
+        """
+        Agrega un registro a la traza y llama a los callbacks con él
+
+        @param iteracion: La iteración o generación
+        @param evaluaciones: Evaluaciones de costo hechas hasta el momento
+        @param costos: Opcional, los costos de la población, para el mejor y el promedio
+        @param poblacion: Opcional, una secuencia de individuos para estimar la diversidad
+        @param datos: Cualquier otro dato a registrar (por ejemplo mejor o temperatura)
+
+        @return: El registro
+
+        """
+        registro = {'iteracion': iteracion, 'evaluaciones': evaluaciones, 'tiempo': time() - self.inicio}
+        if costos is not None:
+            registro['mejor'] = min(costos)
+            registro['promedio'] = float(sum(costos)) / len(costos)
+        if poblacion is not None and self.muestras_diversidad:
+            registro['diversidad'] = diversidad(poblacion, self.muestras_diversidad, self._azar)
+        registro.update(datos)
+        self.traza.append(registro)
+        for callback in self.callbacks:
+            callback(registro)
+        return registro
+
+    def resumen(self):
+        """
+        @return: Un diccionario con los tiempos por fase, el tiempo total y el último registro
+
+        """
+        return {'tiempos': dict(self.tiempos),
+                'tiempo_total': time() - self.inicio,
+                'ultimo': self.traza[-1] if self.traza else None}
+
+    def exporta_csv(self, nombre):
+        """
+        Guarda la traza en un archivo CSV, una columna por cada dato registrado
+        """
+        columnas = sorted(set(llave for registro in self.traza for llave in registro))
+        with open(nombre, 'wb') as archivo:
+            escritor = csv.DictWriter(archivo, columnas)
+            escritor.writeheader()
+            escritor.writerows(self.traza)
+
+    def exporta_json(self, nombre):
+        """
+        Guarda la traza y los tiempos por fase en un archivo JSON
+        """
+        with open(nombre, 'w') as archivo:
+            json.dump({'tiempos': self.tiempos, 'traza': self.traza}, archivo, indent=1, sort_keys=True)
+
+
+def diversidad(poblacion, muestras, azar):
+    """
+    Estima la diversidad de una población como la distancia de Hamming promedio,
+    normalizada entre 0 y 1, de parejas de individuos elegidas al azar.
+
+    @param poblacion: Una secuencia de individuos de la misma longitud
+    @param muestras: Número de parejas
+    @param azar: Un objeto random.Random
+
+    @return: Un número entre 0 (todos iguales) y 1
+
+    """
+    m = len(poblacion)
+    if m < 2:
+        return 0.0
+    n = len(poblacion[0])
+    total = 0
+    for _ in xrange(muestras):
+        i, j = azar.sample(xrange(m), 2)
+        a, b = poblacion[i], poblacion[j]
+        total += sum(1 for k in xrange(n) if a[k] != b[k])
+    return float(total) / (muestras * n)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+islas.py
+------------
+
+Modelo de islas para los algoritmos genéticos de genetico.py: varias poblaciones
+independientes, cada una en su propio proceso, que cada cierto número de generaciones
+intercambian a sus mejores individuos.
+
+Cada isla avanza con Genetico.evoluciona, así que cualquier subclase de Genetico (con
+sus métodos seleccion, cruza y mutacion) puede usarse como isla. Si una isla falla, su
+excepción se lanza en busqueda_islas y el resto de las islas se terminan.
+
+"""
+
+import multiprocessing
+import pickle
+import random
+import Queue
+
+import aleatorio
+import genetico
+
+
+def busqueda_islas(algoritmo, problema, Hacer_C=1, n_islas=4, n_poblacion=10, n_generaciones=30,
+                   intervalo=10, n_migrantes=2, topologia='anillo', elitismo=True, semilla=None):
+    """
+    Algoritmo genético con modelo de islas
+
+    @param algoritmo: Un objeto de una subclase de genetico.Genetico (debe poder
+                      serializarse con pickle)
+    @param problema: Un objeto de la clase blocales.Problema (también serializable)
+    @param Hacer_C: El mismo parámetro de Genetico.busqueda
+    @param n_islas: Número de islas (procesos)
+    @param n_poblacion: Tamaño de la población de cada isla
+    @param n_generaciones: Número total de generaciones de cada isla (al menos 1)
+    @param intervalo: Cada cuántas generaciones hay migración (al menos 1)
+    @param n_migrantes: Cuántos de los mejores individuos de cada isla migran
+    @param topologia: 'anillo' (la isla i recibe a los mejores de la isla i-1) o
+                      'completa' (cada isla recibe a los mejores de entre todas las demás)
+    @param elitismo: Booleano, para aplicar o no el elitismo en cada isla
+    @param semilla: Semilla de la que se sacan las semillas de las islas (si no se da,
+                    se sacan de algoritmo.azar). Cada isla sortea con un flujo propio
+                    (aleatorio.Aleatorio) con su semilla
+
+    @return: Una tupla (estado, estadisticas) con el mejor estado encontrado en todas las
+             islas y una lista con un diccionario de estadísticas por isla
+
+    """
+    if topologia not in ('anillo', 'completa'):
+        raise ValueError("Topología desconocida: " + str(topologia))
+    if n_islas < 1 or n_generaciones < 1 or intervalo < 1:
+        raise ValueError("n_islas, n_generaciones e intervalo deben ser al menos 1")
+
+    semillas = random.Random(semilla) if semilla is not None else algoritmo.azar
+    entradas = [multiprocessing.Queue() for _ in range(n_islas)]
+    salida = multiprocessing.Queue()
+    procesos = [multiprocessing.Process(target=_isla,
+                                        args=(i, algoritmo, problema, Hacer_C, n_poblacion, elitismo,
+                                              n_migrantes, semillas.getrandbits(32), entradas[i], salida))
+                for i in range(n_islas)]
+    for proceso in procesos:
+        proceso.daemon = True
+        proceso.start()
+
+    terminada = False
+    try:
+        migrantes = [[] for _ in range(n_islas)]
+        restantes = n_generaciones
+        while restantes > 0:
+            generaciones = min(intervalo, restantes)
+            restantes -= generaciones
+            for i in range(n_islas):
+                entradas[i].put((generaciones, migrantes[i]))
+            resultados = [None] * n_islas
+            for _ in range(n_islas):
+                i, mejores, estadisticas = _recibe(salida, procesos)
+                resultados[i] = (mejores, estadisticas)
+            migrantes = _migracion([mejores for mejores, _ in resultados], topologia, n_migrantes)
+        terminada = True
+    finally:
+        if terminada:
+            for entrada in entradas:
+                entrada.put(None)
+        else:
+            #Si una isla falló (o se interrumpió la búsqueda) no se espera a las demás
+            for entrada in entradas:
+                entrada.cancel_join_thread()
+            for proceso in procesos:
+                if proceso.is_alive():
+                    proceso.terminate()
+        for proceso in procesos:
+            proceso.join()
+
+    estadisticas = [e for _, e in resultados]
+    mejor = min(range(n_islas), key=lambda i: estadisticas[i]['costo_mejor'])
+    return resultados[mejor][0][0][0], estadisticas
+
+
+def _recibe(salida, procesos, espera=1.0):
+    """
+    Espera la respuesta de una isla, revisando cada cierto tiempo que sigan vivas
+
+    @param salida: La cola de respuestas de las islas
+    @param procesos: Los procesos de las islas
+    @param espera: Segundos entre revisiones
+
+    @return: Una tupla (indice, mejores, estadisticas). Si la isla falló se lanza su
+             excepción, y si una isla terminó sin responder se lanza RuntimeError
+
+    """
+    muerta = None
+    while True:
+        try:
+            indice, mejores, estadisticas = salida.get(timeout=espera)
+        except Queue.Empty:
+            #Después de ver una isla muerta se espera una vez más, por si su error aún no llega
+            if muerta is not None:
+                raise RuntimeError("La isla %d terminó sin responder (código de salida %s)"
+                                   % (muerta, procesos[muerta].exitcode))
+            muerta = next((i for i, proceso in enumerate(procesos) if not proceso.is_alive()), None)
+            continue
+        if mejores is None:
+            raise estadisticas
+        return indice, mejores, estadisticas
+
+
+def _migracion(mejores, topologia, n_migrantes):
+    """
+    Decide qué individuos recibe cada isla
+
+    @param mejores: Por isla, una lista de pares (individuo, costo) ordenada por costo,
+                    con al menos un par aunque n_migrantes sea 0
+    @return: Por isla, la lista de individuos que recibe
+
+    """
+    n_islas = len(mejores)
+    if topologia == 'anillo':
+        return [[ind for ind, _ in mejores[i - 1][:n_migrantes]] for i in range(n_islas)]
+    migrantes = []
+    for i in range(n_islas):
+        otros = sorted((par for j in range(n_islas) if j != i for par in mejores[j]),
+                       key=lambda par: par[1])
+        migrantes.append([ind for ind, _ in otros[:n_migrantes]])
+    return migrantes
+
+
+def _isla(indice, algoritmo, problema, Hacer_C, n_poblacion, elitismo, n_migrantes, semilla,
+          entrada, salida):
+    """
+    Ciclo de una isla: recibe (generaciones, migrantes), cambia a sus peores individuos
+    por los migrantes, avanza las generaciones y devuelve a sus mejores individuos. Si
+    algo falla devuelve (indice, None, excepción) y termina.
+
+    """
+    try:
+        _ciclo_isla(indice, algoritmo, problema, Hacer_C, n_poblacion, elitismo, n_migrantes,
+                    semilla, entrada, salida)
+    except Exception as error:
+        #La excepción viaja por la cola con pickle; si no se puede, se manda su repr
+        try:
+            pickle.loads(pickle.dumps(error, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            error = RuntimeError("Error en la isla %d: %r" % (indice, error))
+        salida.put((indice, None, error))
+
+
+def _ciclo_isla(indice, algoritmo, problema, Hacer_C, n_poblacion, elitismo, n_migrantes, semilla,
+                entrada, salida):
+    random.seed(semilla)
+    algoritmo.azar = problema.azar = aleatorio.Aleatorio(semilla)
+    costo = genetico.CacheCosto(problema.costo, 2 * (n_poblacion + n_migrantes + 1), problema.costo_lote)
+    poblacion = [problema.estado_aleatorio() for _ in range(n_poblacion)]
+    generacion = recibidos = 0
+    while True:
+        mensaje = entrada.get()
+        if mensaje is None:
+            break
+        generaciones, migrantes = mensaje
+        if migrantes:
+            costos = costo.lote(poblacion)
+            orden = sorted(range(len(poblacion)), key=costos.__getitem__)
+            for k, migrante in zip(reversed(orden), migrantes):
+                poblacion[k] = migrante
+            recibidos += len(migrantes)
+
+        poblacion = algoritmo.evoluciona(problema, poblacion, costo, Hacer_C, n_poblacion,
+                                         generaciones, elitismo)
+        generacion += generaciones
+
+        costos = costo.lote(poblacion)
+        orden = sorted(range(len(poblacion)), key=costos.__getitem__)
+        mejores = [(poblacion[k], costos[k]) for k in orden[:max(1, n_migrantes)]]
+        salida.put((indice, mejores, {'isla': indice,
+                                      'generaciones': generacion,
+                                      'costo_mejor': costos[orden[0]],
+                                      'costo_promedio': float(sum(costos)) / len(costos),
+                                      'migrantes_recibidos': recibidos,
+                                      'aciertos_cache': costo.aciertos,
+                                      'fallos_cache': costo.fallos}))
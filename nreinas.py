@@ -11,13 +11,273 @@ Ejemplo de las n_reinas con búsquedas locales
 __author__ = 'juliowaissman'
 
 
+import aleatorio
 import blocales
-from random import shuffle
-from random import sample
-from itertools import permutations
 from itertools import combinations
 from math import exp
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TableroNreinas(object):
+    """
+    Contadores de ocupación por fila y por diagonal de un estado de las n reinas.
+
+    Con los contadores, el costo de un estado es la suma de k(k-1)/2 sobre todas las
+    filas y diagonales con k reinas, y el cambio de costo al intercambiar dos columnas
+    se calcula tocando únicamente las cuatro diagonales de cada reina que se mueve.
+
+    """
+    def __init__(self, estado):
+        n = len(estado)
+        self.estado = list(estado)
+        self.filas = [0] * n
+        self.diag_suma = [0] * (2 * n - 1)
+        self.diag_resta = [0] * (2 * n - 1)
+        for i, fila in enumerate(estado):
+            self.filas[fila] += 1
+            self.diag_suma[i + fila] += 1
+            self.diag_resta[i - fila + n - 1] += 1
+        self.costo = sum(k * (k - 1) // 2
+                         for cuenta in (self.filas, self.diag_suma, self.diag_resta)
+                         for k in cuenta)
+
+    def delta(self, i, j):
+        """
+        Cambio de costo al intercambiar las reinas de las columnas i y j, sin modificar
+        el tablero.
+
+        """
+        if i == j:
+            return 0
+        n1 = len(self.estado) - 1
+        fi, fj = self.estado[i], self.estado[j]
+        return (_delta_diagonal(self.diag_suma, i + fi, j + fj, i + fj, j + fi) +
+                _delta_diagonal(self.diag_resta, i - fi + n1, j - fj + n1, i - fj + n1, j - fi + n1))
+
+    def intercambia(self, i, j):
+        """
+        Intercambia las reinas de las columnas i y j actualizando los contadores.
+
+        @return: El cambio de costo que produjo el intercambio
+
+        """
+        delta = self.delta(i, j)
+        if i == j:
+            return delta
+        n1 = len(self.estado) - 1
+        fi, fj = self.estado[i], self.estado[j]
+        for diagonal, sale1, sale2, entra1, entra2 in (
+                (self.diag_suma, i + fi, j + fj, i + fj, j + fi),
+                (self.diag_resta, i - fi + n1, j - fj + n1, i - fj + n1, j - fi + n1)):
+            diagonal[sale1] -= 1
+            diagonal[sale2] -= 1
+            diagonal[entra1] += 1
+            diagonal[entra2] += 1
+        self.estado[i], self.estado[j] = fj, fi
+        self.costo += delta
+        return delta
+
+
+class TableroConflictos(TableroNreinas):
+    """
+    TableroNreinas para la búsqueda de mínimos conflictos, que además sabe qué reinas
+    están atacadas.
+
+    Por cada diagonal se lleva también la suma de las columnas de sus reinas, así que
+    cuando una diagonal tiene una sola reina se sabe en O(1) cuál es. Las reinas que
+    pueden estar atacadas se guardan en una lista: al intercambiar se agregan las dos
+    reinas que se mueven y la que estaba sola en cada diagonal a la que llegan, y las
+    que ya no están atacadas se sacan hasta que se eligen. Así elegir una reina atacada
+    al azar cuesta O(1) amortizado y la memoria es O(n).
+
+    """
+    def __init__(self, estado, azar=aleatorio.GLOBAL):
+        TableroNreinas.__init__(self, estado)
+        self.azar = azar
+        n = self.n = len(estado)
+        self.col_suma = [0] * (2 * n - 1)
+        self.col_resta = [0] * (2 * n - 1)
+        for i, fila in enumerate(estado):
+            self.col_suma[i + fila] += i
+            self.col_resta[i - fila + n - 1] += i
+        self.lista = [i for i in xrange(n) if self.atacada(i)]
+        self.en_lista = bytearray(n)
+        for i in self.lista:
+            self.en_lista[i] = 1
+
+    def atacada(self, i):
+        """ True si la reina de la columna i comparte fila o diagonal con otra """
+        fila = self.estado[i]
+        return (self.diag_suma[i + fila] > 1 or self.diag_resta[i - fila + self.n - 1] > 1 or
+                self.filas[fila] > 1)
+
+    def conflictiva(self):
+        """
+        @return: La columna de una reina atacada elegida al azar, o None si no hay
+
+        """
+        lista, random = self.lista, self.azar.random
+        while lista:
+            k = int(random() * len(lista))
+            i = lista[k]
+            if self.atacada(i):
+                return i
+            lista[k] = lista[-1]
+            lista.pop()
+            self.en_lista[i] = 0
+        return None
+
+    def candidatos(self, i, k):
+        """ k intercambios aleatorios de la columna i """
+        n, random = self.n, self.azar.random
+        return [(i, int(random() * n)) for _ in xrange(k)]
+
+    def intercambia(self, i, j):
+        if i == j:
+            return 0
+        n1 = self.n - 1
+        fi, fj = self.estado[i], self.estado[j]
+        delta = TableroNreinas.intercambia(self, i, j)
+        suma, resta = self.col_suma, self.col_resta
+        suma[i + fi] -= i
+        suma[j + fj] -= j
+        suma[i + fj] += i
+        suma[j + fi] += j
+        resta[i - fi + n1] -= i
+        resta[j - fj + n1] -= j
+        resta[i - fj + n1] += i
+        resta[j - fi + n1] += j
+        for cuenta, columnas, d1, d2 in ((self.diag_suma, suma, i + fj, j + fi),
+                                         (self.diag_resta, resta, i - fj + n1, j - fi + n1)):
+            #Si las dos reinas llegan a la misma diagonal se cuentan juntas, así la que ya
+            #estaba ahí sola se reconoce aunque la diagonal quede con tres
+            llegadas = ((d1, (i, j)),) if d1 == d2 else ((d1, (i,)), (d2, (j,)))
+            for diagonal, reinas in llegadas:
+                if cuenta[diagonal] > 1:
+                    for k in reinas:
+                        self._marca(k)
+                    if cuenta[diagonal] == len(reinas) + 1:
+                        self._marca(columnas[diagonal] - sum(reinas))
+        return delta
+
+    def _marca(self, i):
+        if not self.en_lista[i]:
+            self.en_lista[i] = 1
+            self.lista.append(i)
+
+
+class TablaIntercambios(object):
+    """
+    Tabla con el cambio de costo de cada intercambio de dos columnas de un estado de las
+    n reinas (requiere numpy), para la búsqueda tabú.
+
+    Los intercambios se numeran una sola vez por n (ver ProblemaNreinas.indice_intercambios)
+    y la tabla se reutiliza en todos los pasos. Al aplicar un intercambio sólo cambia el
+    delta de los intercambios que tocan alguna de las diagonales que cambiaron: los de
+    las reinas que están en esas diagonales (sus renglones y columnas de la tabla) y los
+    que llevarían a una reina a alguna de ellas, que son O(n). Sólo esos se recalculan.
+
+    """
+    def __init__(self, estado, indice):
+        """
+        @param estado: Una tupla con una permutación
+        @param indice: La tupla (I, J, K) de ProblemaNreinas.indice_intercambios
+        """
+        n = self.n = len(estado)
+        self.I, self.J, self.K = indice
+        self.columnas = np.arange(n)
+        self.estado = np.array(estado, dtype=np.int64)
+        self.inversa = np.argsort(self.estado)
+        self.diag_suma = np.bincount(self.columnas + self.estado, minlength=2 * n - 1)
+        self.diag_resta = np.bincount(self.columnas - self.estado + n - 1, minlength=2 * n - 1)
+        self.costo = int(sum((k * (k - 1) // 2).sum() for k in (self.diag_suma, self.diag_resta)))
+        self.deltas = self._calcula(self.I, self.J)
+
+    def actual(self):
+        """ El estado actual como tupla """
+        return tuple(self.estado.tolist())
+
+    def _calcula(self, a, b):
+        """
+        Deltas de los intercambios de las columnas a[k] y b[k], en operaciones de arreglos.
+        Es la misma cuenta de _delta_diagonal: se quitan las dos reinas de sus diagonales
+        y se ponen en las nuevas, una a la vez, contando los pares que se pierden y ganan.
+        """
+        n1 = self.n - 1
+        fa, fb = self.estado[a], self.estado[b]
+        delta = np.zeros(len(a), dtype=np.int64)
+        for cuenta, (s1, s2, t1, t2) in ((self.diag_suma, (a + fa, b + fb, a + fb, b + fa)),
+                                         (self.diag_resta, (a - fa + n1, b - fb + n1, a - fb + n1, b - fa + n1))):
+            delta -= cuenta[s1] - 1
+            delta -= cuenta[s2] - 1 - (s2 == s1)
+            delta += cuenta[t1] - (t1 == s1) - (t1 == s2)
+            delta += cuenta[t2] - (t2 == s1) - (t2 == s2) + (t2 == t1)
+        return delta
+
+    def aplica(self, k):
+        """
+        Aplica el intercambio número k y recalcula los deltas que cambiaron
+
+        @return: El número de deltas recalculados
+
+        """
+        n, n1 = self.n, self.n - 1
+        i, j = self.I[k], self.J[k]
+        fi, fj = self.estado[i], self.estado[j]
+        sumas = np.array([i + fi, j + fj, i + fj, j + fi])
+        restas = np.array([i - fi + n1, j - fj + n1, i - fj + n1, j - fi + n1])
+        np.subtract.at(self.diag_suma, sumas[:2], 1)
+        np.add.at(self.diag_suma, sumas[2:], 1)
+        np.subtract.at(self.diag_resta, restas[:2], 1)
+        np.add.at(self.diag_resta, restas[2:], 1)
+        self.estado[i], self.estado[j] = fj, fi
+        self.inversa[fi], self.inversa[fj] = j, i
+        self.costo += int(self.deltas[k])
+
+        columnas, estado = self.columnas, self.estado
+        #Reinas que están en alguna diagonal que cambió: todos sus intercambios
+        reinas = np.flatnonzero(np.in1d(columnas + estado, sumas) | np.in1d(columnas - estado + n1, restas))
+        a = [np.repeat(reinas, n)]
+        b = [np.tile(columnas, len(reinas))]
+        #Intercambios que llevan a la reina de la columna a a una diagonal que cambió
+        for filas in [d - columnas for d in sumas] + [columnas + n1 - d for d in restas]:
+            validas = (filas >= 0) & (filas < n)
+            a.append(columnas[validas])
+            b.append(self.inversa[filas[validas]])
+        a, b = np.concatenate(a), np.concatenate(b)
+        cambian = np.unique(self.K[a[a != b], b[a != b]])
+        self.deltas[cambian] = self._calcula(self.I[cambian], self.J[cambian])
+        return len(cambian)
+
+
+def _delta_diagonal(cuenta, sale1, sale2, entra1, entra2):
+    """
+    Cambio en el número de pares en conflicto al quitar dos reinas de las diagonales
+    sale1 y sale2 y ponerlas en entra1 y entra2. Deja los contadores como estaban.
+
+    También sirve para LoteNreinas, con cuenta un arreglo de numpy y cada diagonal un par
+    (renglones, columnas) de índices.
+
+    """
+    cuenta[sale1] -= 1
+    delta = -cuenta[sale1]
+    cuenta[sale2] -= 1
+    delta -= cuenta[sale2]
+    delta += cuenta[entra1]
+    cuenta[entra1] += 1
+    delta += cuenta[entra2]
+    cuenta[entra2] += 1
+
+    cuenta[entra2] -= 1
+    cuenta[entra1] -= 1
+    cuenta[sale2] += 1
+    cuenta[sale1] += 1
+    return delta
+
 
 class ProblemaNreinas(blocales.Problema):
     """
@@ -25,20 +285,59 @@ class ProblemaNreinas(blocales.Problema):
 
     entorno = ProblemaNreinas(n) donde n es el número de reinas a colocar
 
-    Por default son las clásicas 8 reinas.
+    Por default son las clásicas 8 reinas. Los sorteos se hacen con azar, un objeto
+    aleatorio.Aleatorio (por default aleatorio.GLOBAL).
 
     """
-    def __init__(self, n=8):
+    def __init__(self, n=8, azar=None):
         self.n = n
+        self.azar = azar if azar is not None else aleatorio.GLOBAL
+        self._tablero = None
+        self._estado_tablero = None
+        self._intercambios = None
+        self._indice = None
+
+    def __getstate__(self):
+        # El tablero y los índices son sólo caches, no vale la pena mandarlos a otros procesos
+        estado = self.__dict__.copy()
+        estado['_tablero'] = estado['_estado_tablero'] = None
+        estado['_intercambios'] = estado['_indice'] = None
+        return estado
+
+    def intercambios(self):
+        """
+        Lista de los intercambios (i, j) con i < j, que se construye una sola vez
+
+        """
+        if self._intercambios is None:
+            self._intercambios = list(combinations(xrange(self.n), 2))
+        return self._intercambios
+
+    def indice_intercambios(self):
+        """
+        Numeración de los intercambios para TablaIntercambios (requiere numpy), que se
+        construye una sola vez
+
+        @return: Una tupla (I, J, K) de arreglos, con I[k] < J[k] las columnas del
+                 intercambio k y K[i, j] = K[j, i] el número del intercambio de i y j
+
+        """
+        if self._indice is None:
+            I, J = np.triu_indices(self.n, 1)
+            K = np.zeros((self.n, self.n), dtype=np.int64)
+            K[I, J] = K[J, I] = np.arange(len(I))
+            self._indice = I, J, K
+        return self._indice
 
     def estado_aleatorio(self):
         estado = range(self.n)
-        shuffle(estado)
+        self.azar.shuffle(estado)
         return tuple(estado)
 
     def vecinos(self, estado):
         """
-        Generador de los vecinos de un estado, permutando de dos en dos posiciones
+        Generador de los vecinos de un estado, permutando de dos en dos posiciones.
+        Cada intercambio (i, j) con i < j se genera una sola vez.
 
         @param estado: Una tupla que describe un estado
 
@@ -46,7 +345,7 @@ class ProblemaNreinas(blocales.Problema):
 
         """
         edo_lista = list(estado)
-        for i, j in permutations(xrange(self.n), 2):
+        for i, j in self.intercambios():
             edo_lista[i], edo_lista[j] = edo_lista[j], edo_lista[i]
             yield tuple(edo_lista)
             edo_lista[i], edo_lista[j] = edo_lista[j], edo_lista[i]
@@ -60,10 +359,49 @@ class ProblemaNreinas(blocales.Problema):
         @return: Una tupla con un estado vecino.
         """
         vecino = list(estado)
-        i, j = sample(range(self.n), 2)
+        i, j = self.azar.pareja(self.n)
         vecino[i], vecino[j] = vecino[j], vecino[i]
         return tuple(vecino)
 
+    def movimientos(self, estado):
+        """
+        Los intercambios (i, j) con i < j, cada uno una sola vez
+
+        """
+        return self.intercambios()
+
+    def movimiento_aleatorio(self, estado):
+        return self.azar.pareja(self.n)
+
+    def aplica_movimiento(self, estado, movimiento):
+        i, j = movimiento
+        vecino = list(estado)
+        vecino[i], vecino[j] = vecino[j], vecino[i]
+        vecino = tuple(vecino)
+        if self._estado_tablero is estado:
+            self._tablero.intercambia(i, j)
+            self._estado_tablero = vecino
+        return vecino
+
+    def delta_costo(self, estado, movimiento):
+        """
+        Cambio de costo al intercambiar dos columnas. Los contadores por diagonal se
+        construyen en O(n) la primera vez que se consulta un estado y se actualizan
+        en O(1) cuando se aplica un movimiento sobre él, por lo que cada delta es O(1).
+
+        """
+        return self.tablero(estado).delta(*movimiento)
+
+    def tablero(self, estado):
+        """
+        Devuelve el TableroNreinas del estado, reutilizando el último si es el mismo
+
+        """
+        if self._estado_tablero is not estado and self._estado_tablero != estado:
+            self._tablero = TableroNreinas(estado)
+        self._estado_tablero = estado
+        return self._tablero
+
     def costo(self, estado):
         """
         Calcula el costo de un estado por el número de conflictos entre reinas
@@ -79,6 +417,145 @@ class ProblemaNreinas(blocales.Problema):
                 c += 1
         return c
 
+    def costo_matriz(self, poblacion):
+        """
+        Calcula el costo de muchos estados a la vez contando cuántas reinas hay en cada
+        fila y en cada diagonal con numpy.bincount (requiere numpy)
+
+        @param poblacion: Un arreglo de numpy de enteros con un estado por renglón
+
+        @return: Un arreglo de numpy con el costo de cada renglón
+
+        """
+        m, n = poblacion.shape
+        columnas = np.arange(n)
+        costo = np.zeros(m, dtype=np.int64)
+        for indice, ancho in ((poblacion, n),
+                              (poblacion + columnas, 2 * n - 1),
+                              (poblacion - columnas + n - 1, 2 * n - 1)):
+            k = _ocupacion(indice, ancho)
+            costo += (k * (k - 1) // 2).sum(axis=1)
+        return costo
+
+    def costo_lote(self, estados):
+        """
+        Costo de muchos estados con una sola llamada a costo_matriz (si hay numpy)
+
+        """
+        if np is None or not estados:
+            return [self.costo(estado) for estado in estados]
+        return self.costo_matriz(np.array(estados, dtype=np.int64)).tolist()
+
+    def lote_estados(self, estados):
+        return LoteNreinas(np.array(estados, dtype=np.int64), self.azar)
+
+    def estado_constructivo(self, intentos=32):
+        """
+        Coloca las reinas columna por columna: para cada columna se prueban hasta
+        intentos filas al azar de entre las que quedan libres y se toma la primera que
+        no está en una diagonal ocupada (o la última probada). Casi todas las reinas
+        quedan sin conflictos, en tiempo O(n * intentos) en el peor caso.
+
+        @param intentos: Filas que se prueban por columna
+
+        @return: Una tupla con una permutación
+
+        """
+        n, randrange = self.n, self.azar.randrange
+        estado = range(n)
+        diag_suma = bytearray(2 * n - 1)
+        diag_resta = bytearray(2 * n - 1)
+        for i in xrange(n):
+            for _ in xrange(intentos):
+                j = randrange(i, n)
+                fila = estado[j]
+                if not diag_suma[i + fila] and not diag_resta[i - fila + n - 1]:
+                    break
+            estado[i], estado[j] = fila, estado[i]
+            diag_suma[i + fila] = diag_resta[i - fila + n - 1] = 1
+        return tuple(estado)
+
+    def tablero_conflictos(self, estado):
+        return TableroConflictos(estado, self.azar)
+
+    def tabla_movimientos(self, estado):
+        return TablaIntercambios(estado, self.indice_intercambios())
+
+
+def _ocupacion(indices, ancho):
+    """
+    Cuenta, renglón por renglón, cuántas veces aparece cada valor entre 0 y ancho - 1
+
+    """
+    m = len(indices)
+    desplazados = indices + np.arange(m)[:, np.newaxis] * ancho
+    return np.bincount(desplazados.ravel(), minlength=m * ancho).reshape(m, ancho)
+
+
+class LoteNreinas(object):
+    """
+    Muchos estados de las n reinas a la vez, como un arreglo de numpy con un estado por
+    renglón, con sus contadores por diagonal. Es la versión vectorizada de TableroNreinas:
+    cada operación se hace para todos los estados (cadenas) en operaciones de arreglos.
+
+    """
+    def __init__(self, estados, azar=aleatorio.GLOBAL):
+        m, n = estados.shape
+        self.azar = azar
+        columnas = np.arange(n)
+        self.estados = estados
+        self.renglones = np.arange(m)
+        self.diag_suma = _ocupacion(estados + columnas, 2 * n - 1)
+        self.diag_resta = _ocupacion(columnas - estados + n - 1, 2 * n - 1)
+        self.costos = sum((k * (k - 1) // 2).sum(axis=1)
+                          for k in (_ocupacion(estados, n), self.diag_suma, self.diag_resta))
+
+    def movimientos_aleatorios(self):
+        """
+        @return: Dos arreglos i, j con un intercambio aleatorio (i != j) por estado
+
+        """
+        m, n = self.estados.shape
+        return self.azar.parejas(n, m)
+
+    def delta(self, i, j):
+        """
+        Cambio de costo de cada estado al intercambiar sus columnas i[k] y j[k]
+
+        """
+        r = self.renglones
+        return sum(_delta_diagonal(diagonal, *[(r, k) for k in indices])
+                   for diagonal, indices in self._diagonales(i, j))
+
+    def intercambia(self, i, j, mascara=None, delta=None):
+        """
+        Aplica los intercambios sólo a los estados donde mascara es verdadero (a todos si
+        no se da una mascara)
+
+        @param delta: El resultado de delta(i, j), si ya se calculó
+
+        """
+        if delta is None:
+            delta = self.delta(i, j)
+        r = self.renglones if mascara is None else np.flatnonzero(mascara)
+        i, j = i[r], j[r]
+        for diagonal, (sale1, sale2, entra1, entra2) in self._diagonales(i, j, r):
+            diagonal[r, sale1] -= 1
+            diagonal[r, sale2] -= 1
+            diagonal[r, entra1] += 1
+            diagonal[r, entra2] += 1
+        fi, fj = self.estados[r, i], self.estados[r, j]
+        self.estados[r, i], self.estados[r, j] = fj, fi
+        self.costos[r] += delta[r]
+
+    def _diagonales(self, i, j, r=None):
+        if r is None:
+            r = self.renglones
+        n1 = self.estados.shape[1] - 1
+        fi, fj = self.estados[r, i], self.estados[r, j]
+        return ((self.diag_suma, (i + fi, j + fj, i + fj, j + fi)),
+                (self.diag_resta, (i - fi + n1, j - fj + n1, i - fj + n1, j - fi + n1)))
+
 
 def prueba_descenso_colinas(problema=ProblemaNreinas(8), repeticiones=10):
     """ Prueba el algoritmo de descenso de colinas con n repeticiones """
@@ -89,18 +566,100 @@ def prueba_descenso_colinas(problema=ProblemaNreinas(8), repeticiones=10):
         print str(intento).center(10) + str(solucion).center(60) + str(problema.costo(solucion)).center(10)
 
 
-def prueba_temple_simulado(problema=ProblemaNreinas(8), K=100, delta=0.01):
-    """ Prueba el algoritmo de temple simulado con calendarizador exponencial """
-
-    solucion = blocales.temple_simulado(problema, lambda i: K * exp(-delta * i))
-    print u"\n\nUtilizando temple simulado con calendarización exponencial"
-    print "K= ", K, " y delta= ", delta
+def prueba_temple_simulado(problema=ProblemaNreinas(8), K=100, delta=0.01, calendarizador=None):
+    """
+    Prueba el algoritmo de temple simulado con calendarizador exponencial, o con el
+    calendarizador dado (por ejemplo blocales.Geometrico(), que estima la temperatura
+    inicial y no requiere ajustar K y delta)
+    """
+    if calendarizador is None:
+        solucion = blocales.temple_simulado(problema, lambda i: K * exp(-delta * i))
+        print u"\n\nUtilizando temple simulado con calendarización exponencial"
+        print "K= ", K, " y delta= ", delta
+    else:
+        solucion = blocales.temple_simulado(problema, calendarizador, criterios=[blocales.CostoObjetivo(0)])
+        print u"\n\nUtilizando temple simulado con el calendarizador ", type(calendarizador).__name__
     print u"\nEl costo de la solución utilizando temple simulado es ", problema.costo(solucion)
     print u"Y la solución es: "
     print solucion
 
 
+def prueba_minimos_conflictos(problema=ProblemaNreinas(1000)):
+    """ Prueba la búsqueda de mínimos conflictos (sirve para n muy grandes) """
+
+    informe = {}
+    solucion = blocales.minimos_conflictos(problema, informe=informe)
+    print u"\n\nUtilizando mínimos conflictos con ", problema.n, " reinas"
+    print u"El costo de la solución es ", informe['costo'], " después de ", informe['iteraciones'], " pasos"
+
+
+def prueba_estructuras_incrementales(problema=ProblemaNreinas(12), intercambios=3000, cada=50):
+    """
+    Revisa las estructuras que se actualizan en forma incremental (TableroConflictos,
+    TablaIntercambios y LoteNreinas) contra ProblemaNreinas.costo calculado desde cero,
+    aplicando intercambios aleatorios. Falla con AssertionError si algún costo o delta
+    no coincide.
+
+    @param intercambios: Intercambios que se aplican a cada estructura
+    @param cada: Cada cuántos intercambios se revisan todos los deltas de la tabla
+
+    """
+    n, azar, costo = problema.n, problema.azar, problema.costo
+
+    tablero = problema.tablero_conflictos(problema.estado_aleatorio())
+    for _ in xrange(intercambios):
+        i, j = azar.randrange(n), azar.randrange(n)
+        antes = tablero.costo
+        delta = tablero.intercambia(i, j)
+        assert tablero.costo == antes + delta == costo(tuple(tablero.estado))
+        #Toda reina atacada debe estar en la lista de las que pueden estarlo
+        e = tablero.estado
+        for k in xrange(n):
+            if any(e[k] == e[c] or abs(e[k] - e[c]) == abs(k - c) for c in xrange(n) if c != k):
+                assert tablero.atacada(k) and tablero.en_lista[k]
+        assert (tablero.conflictiva() is None) == (tablero.costo == 0)
+    print u"\nTableroConflictos: ", intercambios, " intercambios sin errores"
+
+    if np is None:
+        return
+    tabla = problema.tabla_movimientos(problema.estado_aleatorio())
+    I, J, _ = problema.indice_intercambios()
+    for paso in xrange(intercambios):
+        k = azar.randrange(len(I))
+        estado = tabla.actual()
+        esperado = costo(_intercambio(estado, I[k], J[k])) - costo(estado)
+        assert tabla.deltas[k] == esperado
+        tabla.aplica(k)
+        assert tabla.costo == costo(tabla.actual())
+        if paso % cada == 0:
+            estado, c = tabla.actual(), tabla.costo
+            assert all(tabla.deltas[m] == costo(_intercambio(estado, I[m], J[m])) - c
+                       for m in xrange(len(I)))
+    print u"TablaIntercambios: ", intercambios, " intercambios sin errores"
+
+    lote = problema.lote_estados([problema.estado_aleatorio() for _ in xrange(8)])
+    for _ in xrange(intercambios // 8):
+        i, j = lote.movimientos_aleatorios()
+        delta = lote.delta(i, j)
+        antes = [costo(tuple(estado)) for estado in lote.estados.tolist()]
+        despues = [costo(_intercambio(estado, a, b))
+                   for estado, a, b in zip(lote.estados.tolist(), i.tolist(), j.tolist())]
+        assert delta.tolist() == [d - a for a, d in zip(antes, despues)]
+        lote.intercambia(i, j, mascara=azar.uniformes(len(i)) < 0.5, delta=delta)
+        assert lote.costos.tolist() == [costo(tuple(estado)) for estado in lote.estados.tolist()]
+    print u"LoteNreinas: ", intercambios // 8, " pasos de 8 estados sin errores"
+
+
+def _intercambio(estado, i, j):
+    estado = list(estado)
+    estado[i], estado[j] = estado[j], estado[i]
+    return tuple(estado)
+
+
 if __name__ == "__main__":
 
     #prueba_descenso_colinas(ProblemaNreinas(32), 10)
-    prueba_temple_simulado(ProblemaNreinas(64), 500, 0.01)
\ No newline at end of file
+    #prueba_minimos_conflictos(ProblemaNreinas(100000))
+    prueba_temple_simulado(ProblemaNreinas(64), 500, 0.01)
+    #prueba_estructuras_incrementales(ProblemaNreinas(12))
+    #prueba_temple_simulado(ProblemaNreinas(64), calendarizador=blocales.Geometrico(alfa=0.9995))
\ No newline at end of file
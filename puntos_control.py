@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+puntos_control.py
+------------
+
+Puntos de control para reanudar búsquedas largas (Genetico.busqueda y
+blocales.temple_simulado) que se interrumpen.
+
+Cada cierto número de segundos la búsqueda guarda en un archivo binario (pickle,
+protocolo 2) todo lo que necesita para continuar: la población o el estado actual, la
+generación o iteración, las caches y el estado de los generadores aleatorios. Si al
+empezar la búsqueda el archivo existe, se reanuda desde ahí y sigue exactamente igual
+que si no se hubiera interrumpido. Ejemplo:
+
+    punto = PuntoControl('reinas256.pc', segundos=10)
+    algoritmo.busqueda(problema, 1, 64, 100000, punto_control=punto)
+
+Si se interrumpe, basta volver a correr lo mismo para seguir.
+
+"""
+
+import cPickle as pickle
+import os
+import random
+from time import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class PuntoControl(object):
+    """
+    Guarda y carga los puntos de control de una búsqueda en un archivo
+
+    """
+    def __init__(self, nombre, segundos=5.0, borra_al_terminar=True):
+        """
+        @param nombre: El nombre del archivo
+        @param segundos: Cada cuántos segundos se guarda, como mínimo
+        @param borra_al_terminar: Si se borra el archivo cuando la búsqueda termina
+                                  (así una nueva corrida no reanuda una búsqueda ya completa)
+        """
+        self.nombre = nombre
+        self.segundos = segundos
+        self.borra_al_terminar = borra_al_terminar
+        self.generadores = {}
+        self.guardados = 0
+        self.ultima = time()
+
+    def registra_generador(self, nombre, generador):
+        """
+        Agrega un objeto random.Random o aleatorio.Aleatorio (además del generador global
+        de random y el de numpy) cuyo estado se guarda y se restaura con el punto de control.
+        Sirve cualquier objeto con getstate y setstate, por ejemplo para guardar el mejor
+        estado encontrado
+        """
+        self.generadores[nombre] = generador
+
+    def toca(self):
+        """
+        @return: True si ya pasaron los segundos desde el último punto de control
+        """
+        return time() - self.ultima >= self.segundos
+
+    def guarda(self, **datos):
+        """
+        Guarda un punto de control con los datos dados y el estado de los generadores
+        aleatorios. Se escribe primero a un archivo temporal que después se renombra,
+        así que una interrupción a mitad de la escritura no daña el punto anterior.
+        """
+        datos['aleatorio'] = random.getstate()
+        if np is not None:
+            datos['aleatorio_numpy'] = np.random.get_state()
+        datos['generadores'] = dict((nombre, generador.getstate())
+                                    for nombre, generador in self.generadores.items())
+
+        temporal = self.nombre + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            pickle.dump(datos, archivo, 2)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        if os.name == 'nt' and os.path.exists(self.nombre):
+            os.remove(self.nombre)
+        os.rename(temporal, self.nombre)
+        self.guardados += 1
+        self.ultima = time()
+
+    def carga(self):
+        """
+        Carga el punto de control, si existe, y restaura el estado de los generadores
+        aleatorios (los registrados antes de llamar a carga)
+
+        @return: El diccionario con los datos guardados, o None si no hay punto de control
+
+        """
+        if not os.path.exists(self.nombre):
+            return None
+        with open(self.nombre, 'rb') as archivo:
+            datos = pickle.load(archivo)
+        random.setstate(datos.pop('aleatorio'))
+        estado_numpy = datos.pop('aleatorio_numpy', None)
+        if np is not None and estado_numpy is not None:
+            np.random.set_state(estado_numpy)
+        for nombre, estado in datos.pop('generadores').items():
+            if nombre in self.generadores:
+                self.generadores[nombre].setstate(estado)
+        self.ultima = time()
+        return datos
+
+    def termina(self):
+        """
+        Lo llaman las búsquedas al terminar
+        """
+        if self.borra_al_terminar and os.path.exists(self.nombre):
+            os.remove(self.nombre)
+
+
+def restaura_criterios(criterios, guardados):
+    """
+    Copia el estado de los criterios de paro guardados en un punto de control a los
+    criterios de la búsqueda que se reanuda (que deben ser los mismos y en el mismo orden)
+
+    @param criterios: La lista de criterios ya iniciados
+    @param guardados: La lista de criterios guardada en el punto de control
+
+    """
+    for criterio, guardado in zip(criterios, guardados):
+        if type(criterio) is type(guardado):
+            criterio.__dict__.update(guardado.__dict__)
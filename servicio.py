@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+servicio.py
+------------
+
+Servicio para resolver muchas instancias independientes de las n reinas a la vez, sin
+bloquear a quien las pide.
+
+Los trabajos se reparten en un grupo de procesos compartido (uno por núcleo), así que
+el rendimiento crece con el número de núcleos sin tocar las clases de los algoritmos.
+Las peticiones idénticas que están en curso se atienden con un solo trabajo, y los
+tableros resueltos se guardan en una cache por (n, algoritmo, parámetros). Con un
+tiempo límite la búsqueda se detiene y entrega el mejor estado encontrado hasta ahí.
+
+Como pedir un trabajo no bloquea, el servicio puede usarse desde un ciclo de eventos:
+cada trabajo acepta callbacks que se llaman (desde un hilo del servicio) al terminar.
+Un hilo vigilante termina con error los trabajos cuyo proceso murió o cuyo resultado no
+pudo regresar, así que un trabajo siempre termina. Ejemplo:
+
+    with ServicioNreinas() as servicio:
+        trabajos = [servicio.resuelve(n, 'temple', tiempo=5) for n in (8, 16, 32, 64)]
+        for trabajo in trabajos:
+            estado, informe = trabajo.resultado()
+
+"""
+
+import errno
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from multiprocessing.queues import SimpleQueue
+
+import blocales
+import genetico
+import nreinas
+
+ALGORITMOS = {'genetico1': {'n_poblacion': 32, 'n_generaciones': 100, 'prob_muta': 0.05},
+              'genetico2': {'n_poblacion': 32, 'n_generaciones': 100, 'prob_muta': 0.5},
+              'temple': {'K': 100, 'delta': 0.01},
+              'colinas': {'reinicios': 10}}
+
+
+def ejecuta(algoritmo, problema, parametros=None, criterios=None, informe=None):
+    """
+    Corre uno de los algoritmos de ALGORITMOS sobre un problema
+
+    @param algoritmo: El nombre del algoritmo
+    @param problema: Un objeto de una clase heredada de blocales.Problema
+    @param parametros: Diccionario con los parámetros que cambian a los de ALGORITMOS
+    @param criterios: Lista opcional de criterios de paro
+    @param informe: Diccionario opcional donde se reporta cómo terminó la búsqueda
+
+    @return: El estado que devuelve el algoritmo
+
+    """
+    if algoritmo not in ALGORITMOS:
+        raise ValueError("Algoritmo desconocido: " + str(algoritmo))
+    par = dict(ALGORITMOS[algoritmo], **(parametros or {}))
+    if algoritmo == 'genetico1':
+        return genetico.GeneticoPermutaciones1(par['prob_muta']).busqueda(
+            problema, 1, par['n_poblacion'], par['n_generaciones'], criterios=criterios, informe=informe)
+    if algoritmo == 'genetico2':
+        return genetico.GeneticoPermutaciones2(par['prob_muta']).busqueda(
+            problema, 2, par['n_poblacion'], par['n_generaciones'], criterios=criterios, informe=informe)
+    if algoritmo == 'temple':
+        K, delta = par['K'], par['delta']
+        return blocales.temple_simulado(problema, lambda i: blocales.cal_expon(i, K, delta),
+                                        criterios=criterios, informe=informe)
+    return blocales.descenso_colinas(problema, reinicios=par['reinicios'], criterios=criterios, informe=informe)
+
+
+#En cada proceso del grupo, la cola donde se avisa qué proceso empieza cada trabajo
+_avisos = None
+
+
+def _inicia_proceso(avisos):
+    global _avisos
+    _avisos = avisos
+
+
+def _trabajo(argumentos):
+    """
+    Resuelve una petición en un proceso del grupo
+
+    @param argumentos: Una tupla (ident, n, algoritmo, parametros, tiempo)
+
+    @return: Una tupla (resultado, error), con resultado la tupla (estado, informe), o
+             None y la excepción si la búsqueda falló (apply_async no avisa de los errores).
+             Si la excepción no se puede mandar con pickle se manda un RuntimeError con
+             su repr
+
+    """
+    ident, n, algoritmo, parametros, tiempo = argumentos
+    if _avisos is not None:
+        _avisos.put((ident, os.getpid()))
+    criterios = [blocales.CostoObjetivo(0)]
+    if tiempo is not None:
+        criterios.append(blocales.TiempoLimite(tiempo))
+    informe = {}
+    try:
+        estado = ejecuta(algoritmo, nreinas.ProblemaNreinas(n), parametros, criterios, informe)
+    except Exception as error:
+        try:
+            pickle.loads(pickle.dumps(error, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            error = RuntimeError("Error en el trabajo: %r" % (error,))
+        return None, error
+    return (estado, informe), None
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno != errno.ESRCH
+    return True
+
+
+class Trabajo(object):
+    """
+    Una petición en curso o terminada. Varias peticiones idénticas comparten el mismo
+    objeto Trabajo.
+
+    """
+    def __init__(self, llave):
+        self.llave = llave
+        self._listo = threading.Event()
+        self._candado = threading.Lock()
+        self._callbacks = []
+        self._resultado = self._error = None
+
+    def listo(self):
+        """ True si el trabajo ya terminó """
+        return self._listo.is_set()
+
+    def resultado(self, timeout=None):
+        """
+        Espera a que termine el trabajo
+
+        @param timeout: Segundos máximos de espera (None para esperar lo que haga falta)
+
+        @return: Una tupla (estado, informe). El informe es una copia en cada llamada,
+                 porque el resultado se comparte entre las peticiones idénticas y la cache.
+                 Si el trabajo falló se lanza su excepción, y si no termina a tiempo se
+                 lanza multiprocessing.TimeoutError
+
+        """
+        if not self._listo.wait(timeout):
+            raise multiprocessing.TimeoutError()
+        if self._error is not None:
+            raise self._error
+        estado, informe = self._resultado
+        return estado, dict(informe)
+
+    def agrega_callback(self, callback):
+        """
+        Agrega una función que se llama con el trabajo cuando termine (de inmediato si ya
+        terminó)
+        """
+        with self._candado:
+            if not self.listo():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _termina(self, resultado=None, error=None):
+        with self._candado:
+            self._resultado, self._error = resultado, error
+            self._listo.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class ServicioNreinas(object):
+    """
+    Atiende peticiones para resolver las n reinas con un grupo de procesos compartido
+
+    """
+    def __init__(self, procesos=None, tam_cache=1000, vigilancia=1.0):
+        """
+        @param procesos: Número de procesos, por default uno por núcleo
+        @param tam_cache: Máximo número de tableros resueltos que se guardan
+        @param vigilancia: Cada cuántos segundos se revisan los trabajos en curso
+        """
+        self.tam_cache = tam_cache
+        self.vigilancia = vigilancia
+        self.aciertos = self.compartidos = self.trabajos = self.perdidos = 0
+        #SimpleQueue escribe sin hilo alimentador, así el aviso llega aunque el proceso muera
+        self._avisos = SimpleQueue()
+        self._grupo = multiprocessing.Pool(procesos, _inicia_proceso, (self._avisos,))
+        self._candado = threading.Lock()
+        self._cache = OrderedDict()
+        self._en_curso = {}
+        #Por trabajo en curso: [trabajo, tiempo, AsyncResult, pid del proceso que lo resuelve]
+        self._vigilados = {}
+        self._idents = itertools.count()
+        self._cerrado = threading.Event()
+        self._vigilante = threading.Thread(target=self._vigila)
+        self._vigilante.daemon = True
+        self._vigilante.start()
+
+    def resuelve(self, n, algoritmo='temple', parametros=None, tiempo=None, callback=None):
+        """
+        Pide resolver las n reinas, sin esperar a que termine
+
+        @param n: Número de reinas
+        @param algoritmo: Uno de los nombres de ALGORITMOS
+        @param parametros: Diccionario opcional con los parámetros del algoritmo
+        @param tiempo: Segundos máximos de búsqueda, después de los cuales el resultado es
+                       el mejor estado encontrado (None para no tener límite)
+        @param callback: Función opcional que se llama con el Trabajo al terminar
+
+        @return: Un objeto Trabajo
+
+        """
+        if algoritmo not in ALGORITMOS:
+            raise ValueError("Algoritmo desconocido: " + str(algoritmo))
+        llave = (n, algoritmo, tuple(sorted((parametros or {}).items())))
+        with self._candado:
+            if llave in self._cache:
+                self.aciertos += 1
+                trabajo = Trabajo(llave)
+                resultado = self._cache.pop(llave)
+                self._cache[llave] = resultado
+                trabajo._termina(resultado)
+            elif (llave, tiempo) in self._en_curso:
+                self.compartidos += 1
+                trabajo = self._en_curso[(llave, tiempo)]
+            else:
+                self.trabajos += 1
+                trabajo = self._en_curso[(llave, tiempo)] = Trabajo(llave)
+                ident = next(self._idents)
+                pendiente = self._grupo.apply_async(_trabajo, ((ident, n, algoritmo, parametros, tiempo),),
+                                                    callback=lambda r: self._termina(trabajo, tiempo, r))
+                self._vigilados[ident] = [trabajo, tiempo, pendiente, None]
+        if callback is not None:
+            trabajo.agrega_callback(callback)
+        return trabajo
+
+    def _termina(self, trabajo, tiempo, respuesta):
+        resultado, error = respuesta
+        with self._candado:
+            #El callback y el vigilante pueden llegar los dos; sólo cuenta el primero
+            if self._en_curso.get((trabajo.llave, tiempo)) is not trabajo:
+                return
+            del self._en_curso[(trabajo.llave, tiempo)]
+            for ident, vigilado in self._vigilados.items():
+                if vigilado[0] is trabajo:
+                    del self._vigilados[ident]
+            #Sólo se guardan los tableros resueltos, no los que se cortaron por tiempo
+            if error is None and resultado[1]['costo'] == 0:
+                if len(self._cache) >= self.tam_cache:
+                    self._cache.popitem(last=False)
+                self._cache[trabajo.llave] = resultado
+        trabajo._termina(resultado, error)
+
+    def _vigila(self):
+        """
+        Ciclo del hilo vigilante. apply_async en Python 2 no tiene callback de error, así
+        que sin él un trabajo cuyo proceso murió, o cuyo resultado no se pudo mandar con
+        pickle, nunca terminaría y las peticiones idénticas se unirían a él para siempre.
+        """
+        sospechosos = set()
+        while not self._cerrado.wait(self.vigilancia):
+            self._revisa(sospechosos)
+
+    def _revisa(self, sospechosos):
+        while not self._avisos.empty():
+            ident, pid = self._avisos.get()
+            with self._candado:
+                if ident in self._vigilados:
+                    self._vigilados[ident][3] = pid
+        with self._candado:
+            vigilados = self._vigilados.items()
+        for ident, (trabajo, tiempo, pendiente, pid) in vigilados:
+            if pendiente.ready():
+                #Los que terminaron bien ya los atendió el callback
+                if not pendiente.successful():
+                    try:
+                        pendiente.get()
+                    except Exception as error:
+                        self._termina(trabajo, tiempo, (None, error))
+            elif pid is not None and not _vivo(pid):
+                #Se espera una revisión más, por si el resultado venía en camino
+                if ident in sospechosos:
+                    sospechosos.discard(ident)
+                    self.perdidos += 1
+                    self._termina(trabajo, tiempo, (None, RuntimeError(
+                        "El proceso %d terminó sin entregar el trabajo %r" % (pid, trabajo.llave))))
+                else:
+                    sospechosos.add(ident)
+
+    def cierra(self):
+        """ Termina los procesos del servicio, después de que acaben los trabajos en curso """
+        self._grupo.close()
+        with self._candado:
+            vigilados = self._vigilados.values()
+        for trabajo, _, _, _ in vigilados:
+            trabajo._listo.wait()
+        #Un trabajo perdido se queda para siempre en el grupo y join no regresaría
+        if self.perdidos:
+            self._grupo.terminate()
+        self._grupo.join()
+        self._cerrado.set()
+        self._vigilante.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cierra()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+viajero.py
+------------
+
+El problema del agente viajero (simétrico) para las búsquedas locales de blocales.py y
+los algoritmos genéticos de genetico.py, con instancias en el formato de TSPLIB.
+
+Las distancias se calculan una sola vez en una matriz de numpy contigua. En las
+instancias grandes la matriz se guarda en un archivo .npy que se abre mapeado en
+memoria, así que no necesita caber en la memoria y la siguiente vez no se recalcula.
+Ejemplo:
+
+    problema = carga_tsplib('pla7397.tsp')
+    recorrido = blocales.temple_simulado(problema, blocales.Geometrico(), maxit=10 ** 7)
+
+Requiere numpy.
+
+"""
+
+import os
+from itertools import chain, combinations
+
+import aleatorio
+import blocales
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#Instancias con más ciudades que esto guardan su matriz en un archivo mapeado en memoria
+UMBRAL_MAPEO = 5000
+
+FORMATOS_PESOS = {'FULL_MATRIX': None,
+                  'UPPER_ROW': (True, 1), 'LOWER_COL': (True, 1),
+                  'UPPER_DIAG_ROW': (True, 0), 'LOWER_DIAG_COL': (True, 0),
+                  'LOWER_ROW': (False, -1), 'UPPER_COL': (False, -1),
+                  'LOWER_DIAG_ROW': (False, 0), 'UPPER_DIAG_COL': (False, 0)}
+
+
+def lee_tsplib(nombre):
+    """
+    Lee un archivo de TSPLIB (TYPE: TSP) con coordenadas (NODE_COORD_SECTION) o con las
+    distancias explícitas (EDGE_WEIGHT_SECTION)
+
+    @param nombre: El nombre del archivo
+
+    @return: Un diccionario con las llaves de la especificación (NAME, DIMENSION,
+             EDGE_WEIGHT_TYPE, ...) y además 'coordenadas', un arreglo de n x 2, o
+             'pesos', un arreglo con los números de EDGE_WEIGHT_SECTION
+
+    """
+    if np is None:
+        raise ImportError("viajero requiere tener instalado numpy")
+    datos = {}
+    with open(nombre) as archivo:
+        lineas = [linea.strip() for linea in archivo]
+    k = 0
+    while k < len(lineas):
+        linea = lineas[k]
+        k += 1
+        if not linea or linea == 'EOF':
+            continue
+        llave, _, valor = linea.partition(':')
+        llave = llave.strip().upper()
+        if not llave.endswith('SECTION'):
+            datos[llave] = valor.strip()
+            continue
+        #Una sección son todas las líneas de números hasta la siguiente llave
+        inicio = k
+        while k < len(lineas) and lineas[k] and not lineas[k][0].isalpha():
+            k += 1
+        numeros = ' '.join(lineas[inicio:k]).split()
+        if llave == 'NODE_COORD_SECTION':
+            tabla = np.array(numeros, dtype=np.float64).reshape(-1, 3)
+            datos['coordenadas'] = tabla[np.argsort(tabla[:, 0], kind='mergesort'), 1:]
+        elif llave == 'EDGE_WEIGHT_SECTION':
+            datos['pesos'] = np.array(numeros, dtype=np.float64)
+
+    if datos.get('TYPE', 'TSP').split()[0].upper() not in ('TSP', 'STSP'):
+        raise ValueError("Sólo se aceptan instancias simétricas (TYPE: TSP), no " + datos['TYPE'])
+    if 'DIMENSION' not in datos:
+        raise ValueError("Falta DIMENSION en " + nombre)
+    return datos
+
+
+def matriz_distancias(datos, archivo=None, tam_bloque=256):
+    """
+    Calcula la matriz de distancias de una instancia con las fórmulas de TSPLIB
+    (EUC_2D, CEIL_2D, ATT, GEO o EXPLICIT), por bloques de renglones para no crear
+    arreglos temporales de n x n
+
+    @param datos: Un diccionario como el de lee_tsplib
+    @param archivo: Opcional, un archivo .npy donde se escribe la matriz, que se devuelve
+                    abierta en sólo lectura y mapeada en memoria. Se escribe primero a un
+                    archivo temporal que después se renombra, así que una interrupción a
+                    mitad de la escritura no deja una matriz incompleta
+    @param tam_bloque: Renglones que se calculan a la vez
+
+    @return: Un arreglo de numpy de n x n de enteros
+
+    """
+    n = int(datos['DIMENSION'])
+    tipo = datos.get('EDGE_WEIGHT_TYPE', 'EUC_2D').upper()
+    if tipo == 'EXPLICIT':
+        calcula = _pesos_explicitos(datos['pesos'], n, datos.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX').upper())
+    elif tipo in DISTANCIAS:
+        calcula = lambda a, b: DISTANCIAS[tipo](datos['coordenadas'][a:b], datos['coordenadas'])
+    else:
+        raise ValueError("Tipo de distancia desconocido: " + tipo)
+
+    if archivo is None:
+        distancias = np.empty((n, n), dtype=np.int32)
+    else:
+        temporal = archivo + '.tmp.npy'
+        distancias = np.lib.format.open_memmap(temporal, mode='w+', dtype=np.int32, shape=(n, n))
+    for a in xrange(0, n, tam_bloque):
+        b = min(n, a + tam_bloque)
+        bloque = calcula(a, b)
+        bloque[np.arange(b - a), np.arange(a, b)] = 0
+        distancias[a:b] = bloque
+    if archivo is None:
+        return distancias
+    distancias.flush()
+    del distancias
+    if os.name == 'nt' and os.path.exists(archivo):
+        os.remove(archivo)
+    os.rename(temporal, archivo)
+    return np.load(archivo, mmap_mode='r')
+
+
+def _pesos_explicitos(pesos, n, formato):
+    if formato not in FORMATOS_PESOS:
+        raise ValueError("Formato de pesos desconocido: " + formato)
+    if FORMATOS_PESOS[formato] is None:
+        matriz = pesos[:n * n].reshape(n, n)
+    else:
+        superior, k = FORMATOS_PESOS[formato]
+        I, J = np.triu_indices(n, k) if superior else np.tril_indices(n, k)
+        matriz = np.zeros((n, n))
+        matriz[I, J] = pesos[:len(I)]
+        matriz[J, I] = pesos[:len(I)]
+    return lambda a, b: np.rint(matriz[a:b])
+
+
+def _euclidiana(origen, destino):
+    return np.sqrt(((origen[:, np.newaxis, :] - destino[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+
+def _geografica(origen, destino):
+    def radianes(coordenadas):
+        grados = np.trunc(coordenadas)
+        return 3.141592 * (grados + 5.0 * (coordenadas - grados) / 3.0) / 180.0
+    latitud1, longitud1 = radianes(origen[:, 0])[:, np.newaxis], radianes(origen[:, 1])[:, np.newaxis]
+    latitud2, longitud2 = radianes(destino[:, 0]), radianes(destino[:, 1])
+    q1 = np.cos(longitud1 - longitud2)
+    q2 = np.cos(latitud1 - latitud2)
+    q3 = np.cos(latitud1 + latitud2)
+    coseno = np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0)
+    return np.trunc(6378.388 * np.arccos(coseno) + 1.0)
+
+
+def _att(origen, destino):
+    r = np.sqrt(_euclidiana(origen, destino) ** 2 / 10.0)
+    t = np.floor(r + 0.5)
+    return t + (t < r)
+
+
+DISTANCIAS = {'EUC_2D': lambda origen, destino: np.floor(_euclidiana(origen, destino) + 0.5),
+              'CEIL_2D': lambda origen, destino: np.ceil(_euclidiana(origen, destino)),
+              'ATT': _att,
+              'GEO': _geografica}
+
+
+def carga_tsplib(nombre, vecindad='2opt', cache=None, azar=None):
+    """
+    Crea un ProblemaViajero a partir de un archivo de TSPLIB
+
+    @param nombre: El nombre del archivo
+    @param vecindad: La vecindad del problema (ver ProblemaViajero)
+    @param cache: Archivo .npy para la matriz de distancias. Si ya existe (y es más nuevo
+                  que la instancia) se abre mapeado en memoria en lugar de recalcularla.
+                  Por default es nombre + '.npy' en las instancias de más de UMBRAL_MAPEO
+                  ciudades, y las demás se calculan en memoria
+    @param azar: Un objeto aleatorio.Aleatorio opcional
+
+    @return: Un ProblemaViajero
+
+    """
+    datos = lee_tsplib(nombre)
+    n = int(datos['DIMENSION'])
+    if cache is None and n > UMBRAL_MAPEO:
+        cache = nombre + '.npy'
+    distancias = None
+    if cache is not None and os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(nombre):
+        distancias = np.load(cache, mmap_mode='r')
+        if distancias.shape != (n, n):
+            distancias = None
+    if distancias is None:
+        distancias = matriz_distancias(datos, cache)
+    return ProblemaViajero(distancias, vecindad, datos.get('NAME', nombre), azar, cache)
+
+
+def instancia_aleatoria(n, lado=1000, semilla=None, vecindad='2opt', azar=None):
+    """
+    Una instancia EUC_2D con n ciudades al azar en un cuadrado, para pruebas
+
+    """
+    coordenadas = np.random.RandomState(semilla).randint(0, lado, (n, 2)).astype(np.float64)
+    distancias = matriz_distancias({'DIMENSION': n, 'EDGE_WEIGHT_TYPE': 'EUC_2D', 'coordenadas': coordenadas})
+    return ProblemaViajero(distancias, vecindad, 'aleatoria%d' % n, azar)
+
+
+class ProblemaViajero(blocales.Problema):
+    """
+    El agente viajero simétrico. Un estado es una tupla con el orden en que se visitan
+    las ciudades (una permutación de range(n)), así que sirven los operadores de
+    permutaciones de genetico.py, y su costo es la longitud del recorrido cerrado.
+
+    Los movimientos son parejas de posiciones (i, j) con i < j. Con la vecindad '2opt'
+    se invierte el tramo de i a j, que cambia dos aristas; con 'intercambio' se
+    intercambian las ciudades de i y j, que cambia hasta cuatro. En ambos casos
+    delta_costo consulta sólo las aristas que cambian, O(1).
+
+    """
+    def __init__(self, distancias, vecindad='2opt', nombre=None, azar=None, archivo=None):
+        """
+        @param distancias: Un arreglo de numpy de n x n (puede ser un numpy.memmap)
+        @param vecindad: '2opt' o 'intercambio'
+        @param nombre: El nombre de la instancia
+        @param azar: Un objeto aleatorio.Aleatorio opcional para los sorteos
+        @param archivo: El archivo .npy del que está mapeada la matriz, si es el caso.
+                        Al mandar el problema a otro proceso se manda sólo el nombre
+        """
+        if np is None:
+            raise ImportError("viajero requiere tener instalado numpy")
+        if vecindad not in ('2opt', 'intercambio'):
+            raise ValueError("Vecindad desconocida: " + str(vecindad))
+        self.distancias = distancias
+        self.n = len(distancias)
+        self.vecindad = vecindad
+        self.nombre = nombre
+        self.azar = azar if azar is not None else aleatorio.GLOBAL
+        self.archivo = archivo
+
+    def __getstate__(self):
+        # Una matriz mapeada se vuelve a abrir en el otro proceso en lugar de copiarla
+        estado = self.__dict__.copy()
+        if self.archivo is not None:
+            estado['distancias'] = None
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        if self.distancias is None:
+            self.distancias = np.load(self.archivo, mmap_mode='r')
+
+    def estado_aleatorio(self):
+        estado = range(self.n)
+        self.azar.shuffle(estado)
+        return tuple(estado)
+
+    def costo(self, estado):
+        """
+        La longitud del recorrido, volviendo al final a la primera ciudad
+
+        """
+        recorrido = np.fromiter(estado, dtype=np.intp, count=self.n)
+        return int(self._aristas(recorrido, np.roll(recorrido, -1)).sum())
+
+    def _aristas(self, origen, destino):
+        #take sobre la matriz aplanada es más rápido que indexar con dos arreglos
+        return self.distancias.reshape(-1).take(origen * self.n + destino)
+
+    def costo_matriz(self, poblacion):
+        """
+        La longitud de muchos recorridos a la vez, por bloques de renglones para no crear
+        arreglos temporales grandes
+
+        @param poblacion: Un arreglo de numpy de enteros con un recorrido por renglón
+
+        @return: Un arreglo de numpy con la longitud de cada renglón
+
+        """
+        m, n = poblacion.shape
+        costos = np.empty(m, dtype=np.int64)
+        paso = max(1, 2 ** 20 // n)
+        for a in xrange(0, m, paso):
+            bloque = poblacion[a:a + paso]
+            costos[a:a + paso] = self._aristas(bloque, np.roll(bloque, -1, axis=1)).sum(axis=1)
+        return costos
+
+    def costo_lote(self, estados):
+        """
+        Costo de muchos estados con costo_matriz, convirtiéndolos a arreglo por bloques
+
+        """
+        n = self.n
+        paso = max(1, 2 ** 20 // n)
+        costos = []
+        for a in xrange(0, len(estados), paso):
+            bloque = estados[a:a + paso]
+            poblacion = np.fromiter(chain.from_iterable(bloque), dtype=np.intp, count=len(bloque) * n)
+            costos.extend(self.costo_matriz(poblacion.reshape(len(bloque), n)).tolist())
+        return costos
+
+    def vecinos(self, estado):
+        """
+        Generador de los n (n - 1) / 2 vecinos de un estado, uno por movimiento
+
+        """
+        for movimiento in self.movimientos(estado):
+            yield self.aplica_movimiento(estado, movimiento)
+
+    def vecino_aleatorio(self, estado):
+        return self.aplica_movimiento(estado, self.movimiento_aleatorio(estado))
+
+    def movimientos(self, estado):
+        """
+        Las parejas (i, j) con i < j, sin construir la lista
+
+        """
+        return combinations(xrange(self.n), 2)
+
+    def movimiento_aleatorio(self, estado):
+        i, j = self.azar.pareja(self.n)
+        return (i, j) if i < j else (j, i)
+
+    def aplica_movimiento(self, estado, movimiento):
+        i, j = movimiento
+        if self.vecindad == '2opt':
+            return estado[:i] + estado[j:i - 1 if i else None:-1] + estado[j + 1:]
+        vecino = list(estado)
+        vecino[i], vecino[j] = vecino[j], vecino[i]
+        return tuple(vecino)
+
+    def delta_costo(self, estado, movimiento):
+        """
+        Cambio de longitud del movimiento (i, j), con i < j, consultando sólo las aristas
+        que cambian
+
+        """
+        i, j = movimiento
+        n, d = self.n, self.distancias.item
+        anterior, siguiente = estado[i - 1], estado[(j + 1) % n]
+        a, b = estado[i], estado[j]
+        if self.vecindad == '2opt':
+            #Invertir todo el recorrido (o todo menos una ciudad) no cambia su longitud
+            if j - i >= n - 2:
+                return 0
+            return d(anterior, b) + d(a, siguiente) - d(anterior, a) - d(b, siguiente)
+        if j - i == 1:
+            return d(anterior, b) + d(a, siguiente) - d(anterior, a) - d(b, siguiente)
+        if j - i == n - 1:
+            #b va justo antes de a al dar la vuelta
+            despues_a, antes_b = estado[i + 1], estado[j - 1]
+            return d(antes_b, a) + d(b, despues_a) - d(antes_b, b) - d(a, despues_a)
+        despues_a, antes_b = estado[i + 1], estado[j - 1]
+        return (d(anterior, b) + d(b, despues_a) + d(antes_b, a) + d(a, siguiente) -
+                d(anterior, a) - d(a, despues_a) - d(antes_b, b) - d(b, siguiente))
+
+
+def prueba_temple_simulado(problema, maxit=1000000):
+    """ Prueba el temple simulado con un calendarizador geométrico """
+
+    informe = {}
+    alfa = 1.0 - 10.0 / maxit
+    solucion = blocales.temple_simulado(problema, blocales.Geometrico(alfa=alfa), maxit, informe=informe)
+    print u"\n\nUtilizando temple simulado en ", problema.nombre, " con ", problema.n, " ciudades"
+    print u"La longitud del recorrido es ", problema.costo(solucion), " después de ", informe['iteraciones'], " pasos"
+
+
+def prueba_genetico(problema, n_poblacion=64, n_generaciones=200):
+    """ Prueba el algoritmo genético de permutaciones con la cruza por orden """
+
+    import genetico
+    algoritmo = genetico.GeneticoPermutaciones1(1.0 / problema.n, operador_cruza='ox')
+    solucion = algoritmo.busqueda(problema, 1, n_poblacion, n_generaciones, motor='numpy')
+    print u"\n\nUtilizando el algoritmo genético en ", problema.nombre, " con ", problema.n, " ciudades"
+    print u"La longitud del recorrido es ", problema.costo(solucion)
+
+
+if __name__ == "__main__":
+
+    #prueba_temple_simulado(carga_tsplib('pla7397.tsp'), 10 ** 7)
+    prueba_temple_simulado(instancia_aleatoria(1000, semilla=0))
+    prueba_genetico(instancia_aleatoria(1000, semilla=0))